@@ -1,21 +1,39 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 import pandas as pd
-import io
+import asyncio
+from contextlib import asynccontextmanager
 from .recommendation import recommend_actions
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 import numpy as np
 import json
+import os
+import threading
 from core.data_steward import apply_recommendations
 from core.data_quality import quality
+from core.logic import preload_models
+
+# orjson is optional (see requirements.txt): it serializes numpy values natively
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 """
 this is a simple FastAPI application that allows users to upload a CSV file
 and receive recommendations based on the data in the file.
 i opted not to go for a more complex setup since the calls to the recommendation engine
 are expected to be lightweight and the data processing is straightforward.
+the csv parsing and the analysis are still blocking pandas/spacy work, so the handlers
+run them with asyncio.to_thread to keep the event loop free for other uploads.
 """
-app = FastAPI(title="Recommendation API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the medical model is loaded before the first request is served, a failing load stops the startup
+    await asyncio.to_thread(preload_models)
+    yield
+
+app = FastAPI(title="Recommendation API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,14 +43,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-## NOTE: Flattening logic removed per request—backend now assumes the new
-## serialized recommendation format produced by recommend_actions and returns
-## it verbatim.
+CSV_CHUNK_SIZE = 100_000 # rows parsed at a time when reading an uploaded csv
+
+def read_csv_upload(fileobj, **kwargs) -> pd.DataFrame:
+    """Parse an uploaded CSV directly from its spooled file, chunk by chunk,
+    so the raw upload is never copied into memory as bytes before parsing."""
+    chunks = pd.read_csv(fileobj, chunksize=CSV_CHUNK_SIZE, **kwargs)
+    return pd.concat(chunks, ignore_index=True)
+
+CSV_RESPONSE_ROWS = 10_000 # rows serialized per block of a streamed csv response
+
+def iter_csv(df: pd.DataFrame):
+    """Yield a DataFrame as CSV text block by block, so the response starts
+    streaming before the whole file is serialized and it is never held in memory at once."""
+    yield df.head(0).to_csv(index=False)
+    for start in range(0, len(df), CSV_RESPONSE_ROWS):
+        yield df.iloc[start:start + CSV_RESPONSE_ROWS].to_csv(index=False, header=False)
+
+RECOMMENDATIONS_LOG = "logs/recommendations.json"
+
+def dump_recommendations(rec) -> bytes:
+    """Serialize the recommendations once, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(rec, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(rec, indent=2, ensure_ascii=False).encode("utf-8")
+
+def write_recommendations_log(payload: bytes):
+    """Persist the last recommendations.
+    The payload goes to a temp file that replaces the log in one step, so with several workers
+    the log is always one whole payload and never a mix of two writes."""
+    tmp = f"{RECOMMENDATIONS_LOG}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, RECOMMENDATIONS_LOG)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
 
-# NOTE: Per request, the existing recommendation endpoint is disabled.
-# It previously accepted a CSV file and returned freshly computed recommendations.
-#
-# """
 @app.post("/recommend")
 async def recommend(file: UploadFile = File(...)):
     """Return ONLY the new serialized recommendation format directly.
@@ -47,33 +96,15 @@ async def recommend(file: UploadFile = File(...)):
     We do not reshape or flatten; the structure is persisted and returned verbatim.
     """
     try:
-        df = pd.read_csv(file.file)
-        rec = recommend_actions(df)
-        with open("logs/recommendations.json", "w", encoding="utf-8") as f:
-            json.dump(rec, f, indent=2, ensure_ascii=False)
-        return JSONResponse(content=rec)
+        df = await asyncio.to_thread(read_csv_upload, file.file)
+        rec = await asyncio.to_thread(recommend_actions, df)
+        payload = dump_recommendations(rec)
+        await asyncio.to_thread(write_recommendations_log, payload)
+        return Response(content=payload, media_type="application/json")
     except Exception as e:
         print(f"DEBUG: Error in recommend: {e}")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
-# New endpoint: return the content of logs/recommendations.json as-is
-#@app.post("/recommend")
-#async def get_saved_recommendations():
-#    """Return the precomputed recommendations from logs/recommendations.json.
-#
-#    Response: JSON content of the file, or 404 if missing, 500 on parse/IO error.
-#    """
-#    try:
-#        with open("logs/recommendations.json", "r", encoding="utf-8") as f:
-#            data = json.load(f)
-#        return JSONResponse(content=data)
-#    except FileNotFoundError:
-#        raise HTTPException(status_code=404, detail="logs/recommendations.json not found")
-#    except json.JSONDecodeError as e:
-#        raise HTTPException(status_code=500, detail=f"Invalid JSON in recommendations file: {e}")
-#    except Exception as e:
-#        raise HTTPException(status_code=500, detail=f"Failed to read recommendations: {e}")
-
 @app.post("/feedback")
 async def post_feedback(request: Request):
     """
@@ -97,7 +128,7 @@ async def post_feedback(request: Request):
         return JSONResponse(status_code=422, content={"error": "Missing 'feedback' field."})
 
     try:
-        df = pd.read_csv(uploaded.file, dtype=str)
+        df = await asyncio.to_thread(read_csv_upload, uploaded.file, dtype=str)
     except Exception as e:
         return JSONResponse(status_code=400, content={"error": f"Could not read CSV: {e}"})
 
@@ -109,21 +140,34 @@ async def post_feedback(request: Request):
         return JSONResponse(status_code=400, content={"error": f"Invalid JSON in 'feedback': {e}"})
 
     try:
-        new_df = apply_recommendations(df, feedback, jobs_csv_path="assets/generelized_jobs.csv")
+        new_df = await asyncio.to_thread(
+            apply_recommendations, df, feedback, jobs_csv_path="assets/generelized_jobs.csv"
+        )
     except FileNotFoundError as e:
         return JSONResponse(status_code=500, content={"error": f"Missing resource: {e}"})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": f"Apply failed: {e}"})
 
-    buf = io.StringIO()
-    new_df.to_csv(buf, index=False)
-    buf.seek(0)
     return StreamingResponse(
-        buf,
+        iter_csv(new_df),
         media_type="text/csv",
         headers={"Content-Disposition": 'attachment; filename="stewarded_result.csv"'},
     )
 
+def convert_numpy_types(obj):
+    """Convert numpy types to native Python types for JSON serialization
+    (only used when orjson is not installed)"""
+    if isinstance(obj, dict):
+        return {k: convert_numpy_types(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_numpy_types(item) for item in obj]
+    elif isinstance(obj, (np.integer, np.floating)):
+        return obj.item()
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    else:
+        return obj
+
 @app.post("/quality")
 async def get_quality_indicators(file: UploadFile = File(...)):
     """Receive CSV file and return comprehensive data quality indicators"""
@@ -132,31 +176,26 @@ async def get_quality_indicators(file: UploadFile = File(...)):
         if not file.filename.endswith(".csv"):
             raise HTTPException(status_code=400, detail="Only CSV files are supported.")
 
-        # Read the file content
-        raw = await file.read()
-        if not raw:
+        # Check the upload is not empty without reading it all into memory
+        if not await file.read(1):
             raise HTTPException(status_code=400, detail="Empty file uploaded.")
-        
+        await file.seek(0)
+
         # Read file into pandas DataFrame
-        df = pd.read_csv(io.BytesIO(raw))
+        df = await asyncio.to_thread(read_csv_upload, file.file)
 
         # Compute comprehensive quality indicators using our enhanced function
-        indicators = quality(df)
-
-        # Convert numpy types to native Python types for JSON serialization
-        def convert_numpy_types(obj):
-            if isinstance(obj, dict):
-                return {k: convert_numpy_types(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [convert_numpy_types(item) for item in obj]
-            elif isinstance(obj, (np.integer, np.int64, np.int32)):
-                return int(obj)
-            elif isinstance(obj, (np.floating, np.float64, np.float32)):
-                return float(obj)
-            elif isinstance(obj, np.ndarray):
-                return obj.tolist()
-            else:
-                return obj
+        indicators = await asyncio.to_thread(quality, df)
+
+        # orjson writes numpy scalars/arrays itself, no need to walk the indicators first
+        if orjson is not None:
+            return Response(
+                content=orjson.dumps(
+                    {"indicators": indicators},
+                    option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+                ),
+                media_type="application/json",
+            )
 
         # Clean the indicators for JSON response
         clean_indicators = convert_numpy_types(indicators)
@@ -166,4 +205,24 @@ async def get_quality_indicators(file: UploadFile = File(...)):
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+if __name__ == "__main__":
+    # python -m core.backend
+    # each worker is its own process with its own analyzer, so the CPU-bound requests
+    # no longer queue behind a single interpreter. uvloop/httptools are picked up by
+    # loop/http="auto" when uvicorn[standard] is installed.
+    # note: uvicorn's --reload only works with a single worker (UVICORN_WORKERS=1)
+    import os
+    import uvicorn
+
+    uvicorn.run(
+        "core.backend:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=int(os.getenv("UVICORN_WORKERS", "4")),
+        loop="auto",
+        http="auto",
+        limit_concurrency=int(os.getenv("UVICORN_LIMIT_CONCURRENCY", "1024")),
+        backlog=int(os.getenv("UVICORN_BACKLOG", "2048")),
+    )
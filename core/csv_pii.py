@@ -1,8 +1,15 @@
 import pandas as pd
+import numpy as np
 import json
+import os
+from functools import lru_cache
+from operator import itemgetter
 from rapidfuzz.fuzz import token_set_ratio
-from .logic import get_analyzer
+from rapidfuzz.process import extractOne
+from presidio_analyzer import BatchAnalyzerEngine
+from .logic import get_analyzer, medical_batch
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 """
 this script aim to make the analyzer more optimised for csv files
 it will read the csv headers and try to match them with known entities
@@ -10,33 +17,55 @@ then it will sample the rows to analyze them and create a profile for each heade
 if matching is not found, it will analyze the whole column
 it will also mask the entities in the text and create a report of the masking
 """
-csv_file = pd.read_csv("assets/test.csv")
+MIN_SCORE = 0.6 # minimum score to consider an entity detected
+BATCH_SIZE = 64 # number of cells handed to spacy's nlp.pipe at once
+SLICE_SIZE = BATCH_SIZE * 8 # cells whose medical docs are kept alive together (per worker)
+MAX_WORKERS = os.cpu_count() or 1 # threads used to analyze the columns of a csv
+DEBUG = os.getenv("PII_DEBUG", "0") == "1" # keep the analyzed samples in the profiles
 
-headers = csv_file.columns.tolist()
-with open("assets/rgdp_glossary.json") as f:
-    GDPR_CATEGORIES = json.load(f)
+@lru_cache(maxsize=1)
+def get_gdpr_categories():
+    """
+    the rgdp glossary is read on first use (and only once) instead of when the module is imported
+    """
+    with open("assets/rgdp_glossary.json") as f:
+        return json.load(f)
+
+def clean_header(text):
+    return text.strip().lower().replace("_", "").replace(" ", "")
+
+@lru_cache(maxsize=1)
+def cleaned_synonyms():
+    """
+    loads the entities synonyms on first use and cleans them once instead of on every header of every call
+    returns two parallel lists: the entity of each synonym and the cleaned synonym
+    """
+    with open("assets/entities_synonymes.json") as f:
+        entity_synonyms = json.load(f)
+    entities = []
+    cleaned = []
+    for entity, synonyms in entity_synonyms.items():
+        for syn in synonyms:
+            entities.append(entity)
+            cleaned.append(clean_header(syn))
+    return entities, cleaned
 
-MIN_SCORE = 0.6 # minimum score to consider an entity detected
 def score_header(headers, threshhold=70):
     """
         this function uses token_Set_ration to match headers with known entities sysnonyms
         then returns a dictionary with the header as key and the matched entity and score as value
         if no match is found, the entity is set to None
+        the scan over the synonyms is done by rapidfuzz's extractOne (C loop, stops early on a perfect match)
     """
-    with open("assets/entities_synonymes.json") as f:
-        ENTITY_SYNONYMS = json.load(f)
+    synonym_entities, synonyms = cleaned_synonyms()
     header_match = {}
     for header in headers:
-        header_clean = header.strip().lower().replace("_", "").replace(" ", "") # clean the header
         best_match = None
         best_score = 0
-        for entity, synonyms in ENTITY_SYNONYMS.items():
-            for syn in synonyms:
-                syn_cleaned = syn.strip().lower().replace("_", "").replace(" ", "")
-                score = token_set_ratio(header_clean, syn_cleaned)
-                if score > best_score:
-                    best_score = score
-                    best_match = entity
+        found = extractOne(clean_header(header), synonyms, scorer=token_set_ratio)
+        if found is not None:
+            _, best_score, position = found
+            best_match = synonym_entities[position]
         if best_score >= threshhold:
             header_match[header] = {"entity":best_match, "score": best_score}
         else:
@@ -44,8 +73,6 @@ def score_header(headers, threshhold=70):
     return header_match
 
 
-scores = score_header(headers, threshhold=70) # this is just for the test
-
 def adaptive_sampling(rows, threshold=0.3, min_samples=30): 
     """
     we use this adaptive sampling to sample a percetage of the rows if the number or rows is low and a 
@@ -56,44 +83,70 @@ def adaptive_sampling(rows, threshold=0.3, min_samples=30):
         return rows
     return rows[:min(int(length * threshold), min_samples)]
 
-def sample_analyze(headers, rows, analyzer, scores):
+def batch_analyze(texts, analyzer):
+    """
+    this function analyzes a list of texts in one go instead of calling analyzer.analyze per cell
+    spacy (and the medical model) runs once over the whole batch with nlp.pipe, then the recognizers run on each text
+    it returns one list of results (already filtered with MIN_SCORE) per text, in the same order
+    the texts go through in slices of SLICE_SIZE so only one slice of medical docs is in memory at a time
+    """
+    if not texts:
+        return []
+    batch = BatchAnalyzerEngine(analyzer_engine=analyzer)
+    analyzed = []
+    for i in range(0, len(texts), SLICE_SIZE):
+        chunk = texts[i:i + SLICE_SIZE]
+        with medical_batch(analyzer, chunk, BATCH_SIZE):
+            results = batch.analyze_iterator(chunk, language="en", batch_size=BATCH_SIZE)
+            analyzed.extend([r for r in res if r.score >= MIN_SCORE] for res in results)
+    return analyzed
+
+def memo_analyze(texts, analyzer, memo):
+    """
+    batch_analyze with a memo (text -> results) that can be shared between calls
+    only the texts that are not in the memo yet are analyzed (once each) and added to it
+    """
+    todo = [text for text in dict.fromkeys(texts) if text not in memo]
+    memo.update(zip(todo, batch_analyze(todo, analyzer)))
+    return [memo[text] for text in texts]
+
+def sample_analyze(headers, df, analyzer, scores, memo=None):
     """
     this function will sample the rows and analyze them to create a profile for each header
+    only the sampled slice of the columns with a guessed entity is read from the dataframe
+    when a memo dict is given, the results of the sampled cells are kept in it (see memo_analyze)
     it will return a dictionary with the header as key and the profile as value
     """
     profiled = {}
-    simple = adaptive_sampling(rows)
     for idx, header in enumerate(headers):
         if header not in scores or scores[header]["entity"] is None:
             continue
         entity = defaultdict(int)
         entity_det = []
 
-        for row in simple:
-            if idx >= len(row):
-                continue
-            cell = row[idx]
-            if pd.isna(cell):
-                continue
-            results = analyzer.analyze(text=str(cell), language="en")
-            filtred = [r for r in results if r.score >= MIN_SCORE]
-
+        column = df[header]
+        simple = adaptive_sampling(column.to_numpy())
+        na = column.iloc[:len(simple)].isna().to_numpy()
+        cells = [cell for cell, missing in zip(simple, na) if not missing]
+        texts = [cell if isinstance(cell, str) else str(cell) for cell in cells]
+        results = batch_analyze(texts, analyzer) if memo is None else memo_analyze(texts, analyzer, memo)
+        for cell, filtred in zip(cells, results):
             for r in filtred:
                 entity[r.entity_type] += 1
-            
-            entity_det.append(
-                {"Text" : cell,
-                "entities" : [r.to_dict() for r in filtred]}
-            )
+            if DEBUG:
+                entity_det.append(
+                    {"Text" : cell,
+                    "entities" : [r.to_dict() for r in filtred]}
+                )
 
-        hits = sorted(entity.items(), key=lambda x: x[1], reverse=True)
+        hits = sorted(entity.items(), key=itemgetter(1), reverse=True)
         profiled[header] = {
             "index": idx,
             "guessed_entity": scores[header]["entity"],
             "similarity_score": scores[header]["score"],
             "top_detected_entities": hits,
             "samples": entity_det
-        } # i detailled the profile for debugging purposes
+        } # samples are only filled when PII_DEBUG=1
     return profiled
 
 def full_analyze_mask(column, analyzer):
@@ -101,47 +154,68 @@ def full_analyze_mask(column, analyzer):
     this function will analyze the whole column and mask it at the same time to save resources
     it will return a list of masked texts
     """
-    masked = []
-    for cell in column:
-        if pd.isna(cell):
-            masked.append(None)
-            continue
-        cell = str(cell)
-        results = analyzer.analyze(text=str(cell), language="en")
-        results = [r for r in results if r.score >= MIN_SCORE]
-
-        selected = []
-        results.sort(key=lambda x: (x.start,-x.end))
-        prev = None
-        for r in results:
-            if not prev:
-                prev = r
-                continue
-            if r.start < prev.end:
-                prev_span = prev.end - prev.start
-                r_span = r.end - r.start
-                if r_span > prev_span or (r_span == prev_span and r.score > prev.score):
-                    prev = r
-            else:
-                selected.append(prev)
-                prev = r
-        if prev:
-            selected.append(prev)
-            for r in selected:
-                cat = r.entity_type
-                report[column.name][cat] += 1
-        masked_text = mask(cell, selected)
-        masked.append(masked_text)
+    masked, counts = analyze_mask_column(column, analyzer)
+    add_to_report(column.name, counts)
     return masked
 
+def analyze_mask_column(column, analyzer):
+    """
+    same as full_analyze_mask but the entity counts are returned instead of being added to the report
+    so columns can be analyzed in parallel and reported in their original order
+    """
+    cells = column.tolist()
+    masked = [None] * len(cells)
+    counts = defaultdict(int)
+    positions = np.flatnonzero(column.notna().to_numpy()).tolist()
+    texts = [cell if isinstance(cell, str) else str(cell) for cell in (cells[i] for i in positions)]
+    for i, cell, results in zip(positions, texts, batch_analyze(texts, analyzer)):
+        selected = resolve_overlaps(results)
+        for r in selected:
+            counts[r.entity_type] += 1
+        masked[i] = mask(cell, selected)
+    return masked, counts
+
+def add_to_report(name, counts):
+    for cat, count in counts.items():
+        report[name][cat] += count
+
+def resolve_overlaps(results):
+    """
+    this function will sort the detected spans by start (longest first) and keep only one span per overlap
+    the longest span wins, and the highest score on equal length
+    the spans are sorted and compared as numpy arrays instead of attributes of the results
+    """
+    if len(results) < 2:
+        return list(results)
+    starts = np.fromiter((r.start for r in results), dtype=np.int64, count=len(results))
+    ends = np.fromiter((r.end for r in results), dtype=np.int64, count=len(results))
+    scores = np.fromiter((r.score for r in results), dtype=np.float64, count=len(results))
+    order = np.lexsort((-ends, starts)).tolist()
+    starts, ends, scores = starts.tolist(), ends.tolist(), scores.tolist()
+    kept = []
+    prev = order[0]
+    for j in order[1:]:
+        if starts[j] < ends[prev]:
+            prev_span = ends[prev] - starts[prev]
+            span = ends[j] - starts[j]
+            if span > prev_span or (span == prev_span and scores[j] > scores[prev]):
+                prev = j
+        else:
+            kept.append(prev)
+            prev = j
+    kept.append(prev)
+    return [results[j] for j in kept]
+
 report = defaultdict(lambda: defaultdict(int))
+
 def mask(text: str, entities):
     """
     this is simplified masking function based on the rgdp glossary
     it can be more sofisticated to treat each entity type differently
     but for now it will just mask the entities with the category name
     """
-    masked = ""
+    parts = []
+    append = parts.append
     last_end = 0
     for entity in entities:
         start = entity.start if hasattr(entity, "start") else entity["start"]
@@ -149,12 +223,12 @@ def mask(text: str, entities):
         label = entity.entity_type if hasattr(entity, "entity_type") else entity["entity_type"]
         category = label
 
-        masked += text[last_end:start]
-        masked += f"<{category}>"
+        append(text[last_end:start])
+        append(f"<{category}>")
         last_end = end_pos
 
-    masked += text[last_end:]
-    return masked
+    append(text[last_end:])
+    return "".join(parts)
 
 
 def process_csv(csv_path):
@@ -165,17 +239,17 @@ def process_csv(csv_path):
     """
     df = pd.read_csv(csv_path, dtype=str)
     headers = df.columns.tolist()
-    rows = df.values.tolist()
     analyzer = get_analyzer()
 
     scores = score_header(headers, threshhold=70)
 
-    profiled = sample_analyze(headers, rows, analyzer, scores)
+    profiled = sample_analyze(headers, df, analyzer, scores)
 
+    to_analyze = [] # columns that need a full analysis
     for header in headers:
         profile_info = profiled.get(header)
         if not profile_info: # case no guessed entity or no profile
-            df[header] = full_analyze_mask(df[header].rename(header) ,analyzer)
+            to_analyze.append(header)
             continue
         guessed_entity = profile_info["guessed_entity"]
         top_entities = profile_info["top_detected_entities"]
@@ -183,17 +257,25 @@ def process_csv(csv_path):
             ent == guessed_entity and count > 0 for ent, count in top_entities
         )
         if is_confirmed:
-            df[header] = df[header].apply(
-                lambda x: f"<{guessed_entity}>" if pd.notna(x) else x
-            )
+            df[header] = df[header].where(df[header].isna(), f"<{guessed_entity}>")
         else:
-            df[header] = full_analyze_mask(df[header], analyzer)
+            to_analyze.append(header)
 
-    return df,report
+    # the columns are independent, so they are analyzed in parallel and written back in order
+    if to_analyze:
+        with ThreadPoolExecutor(max_workers=min(len(to_analyze), MAX_WORKERS)) as executor:
+            futures = [executor.submit(analyze_mask_column, df[header], analyzer) for header in to_analyze]
+            for header, future in zip(to_analyze, futures):
+                masked, counts = future.result()
+                add_to_report(header, counts)
+                df[header] = masked
 
+    return df,report
 
 
-masked_df,masking_report = process_csv("assets/test.csv")
-masked_df.to_csv("assets/masked_test.csv", index=False)
-with open("assets/masking_report.json", "w") as f:
-    json.dump(masking_report, f, indent=2)
\ No newline at end of file
+if __name__ == "__main__":
+    # python -m core.csv_pii
+    masked_df,masking_report = process_csv("assets/test.csv")
+    masked_df.to_csv("assets/masked_test.csv", index=False)
+    with open("assets/masking_report.json", "w") as f:
+        json.dump(masking_report, f, indent=2)
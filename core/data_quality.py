@@ -1,5 +1,15 @@
-import pandas as pd
+import os
 import re
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+# pyarrow is optional (see requirements.txt): its regex kernels validate a whole column in C++
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
 
 # Some global variables for the matching if any other indicator was to be added a matching regex will have to be added here
 EMAIL_RE = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
@@ -11,28 +21,108 @@ URL_RE = re.compile(r"^https?://(?:[-\w.])+(?:\:[0-9]+)?(?:/(?:[\w/_.])*(?:\?(?:
 POSTAL_CODE_RE = re.compile(r"^[A-Z0-9]{3,10}$")
 CREDIT_CARD_RE = re.compile(r"^(?:\d{4}[-\s]?){3}\d{4}$")
 IP_ADDRESS_RE = re.compile(r"^(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$")
+PHONE_CLEAN_RE = re.compile(r"[\s\-\(\)]")  # separators stripped before validating phone numbers
+WHITESPACE_RE = re.compile(r"\s{2,}")
+NON_ASCII_RE = re.compile(r"[^\x00-\x7F]")
+PARALLEL_MIN_CELLS = 200_000  # below this many cells the columns are analyzed one after the other
+MAX_WORKERS = os.cpu_count() or 1
+MIN_OUTLIER_SAMPLES = 20  # below this many values the IQR outlier check is just noise
+
+# Column name -> expected format, one match per column. The branches are tried in order so
+# the first kind whose keyword appears anywhere in the (lowercased) name wins
+COLUMN_KIND_RE = re.compile(
+    r"(?:(?=.*(?:email|mail|@))(?P<email>)"
+    r"|(?=.*(?:phone|tel|mobile|cell))(?P<phone>)"
+    r"|(?=.*(?:date|time|created|updated|birth))(?P<date>)"
+    r"|(?=.*(?:url|link|website|http))(?P<url>)"
+    r"|(?=.*(?:postal|zip|postcode))(?P<postal_code>))",
+    re.DOTALL,
+)
+# kind -> (validation regex, format issue, suggestion)
+FORMAT_CHECKS = {
+    "email": (EMAIL_RE, "Invalid email formats detected", "Ensure emails follow format: user@domain.com"),
+    "phone": (PHONE_RE, "Invalid phone number formats", "Use international format: +1234567890"),
+    "date": (DATE_RE, "Inconsistent date formats", "Standardize date format (YYYY-MM-DD recommended)"),
+    "url": (URL_RE, "Invalid URL formats", "URLs should start with http:// or https://"),
+    "postal_code": (POSTAL_CODE_RE, "Invalid postal code formats", "Use standard postal code format for your region"),
+}
+
+
+class ColumnKind(NamedTuple):
+    """What a column holds, decided once from its name and dtype and shared by every indicator"""
+    text_format: Optional[str]  # FORMAT_CHECKS key matched by the name of a text column, else None
+    is_text: bool
+    is_numeric: bool
+
+
+def classify_columns(df: pd.DataFrame) -> dict:
+    kinds = {}
+    for col, dtype in df.dtypes.items():
+        is_text = dtype == "object"
+        match = COLUMN_KIND_RE.match(col.lower()) if is_text else None
+        kinds[col] = ColumnKind(
+            text_format=match.lastgroup if match else None,
+            is_text=is_text,
+            is_numeric=dtype in ["int64", "float64"],
+        )
+    return kinds
+
+
+def map_columns(func, df: pd.DataFrame, kinds: Optional[dict] = None) -> dict:
+    """Run func(col, series, total_rows, kind) on every column and return {col: result} in column order.
+    The columns are independent and the work is mostly in pandas/pyarrow C code,
+    so large frames are spread over a thread pool
+    """
+    if kinds is None:
+        kinds = classify_columns(df)
+    columns = list(df.columns)
+    args = ([df[col] for col in columns], [len(df)] * len(columns), [kinds[col] for col in columns])
+    if len(columns) > 1 and len(df) * len(columns) >= PARALLEL_MIN_CELLS:
+        with ThreadPoolExecutor(max_workers=min(len(columns), MAX_WORKERS)) as executor:
+            results = list(executor.map(func, columns, *args))
+    else:
+        results = list(map(func, columns, *args))
+    return dict(zip(columns, results))
 
 
-def comp(df: pd.DataFrame) -> dict:
+def count_invalid(str_data: pd.Series, pattern: re.Pattern):
+    """Number of values of a (stripped) string column that don't match `pattern`.
+    Runs on pyarrow's regex kernel when pyarrow is installed, falls back to Series.str.match.
+    RE2's digit, word and space classes only match ascii while python's re matches unicode, so the kernel is only
+    used on all-ascii columns where both engines agree
+    """
+    if pc is not None:
+        try:
+            arr = pa.array(str_data, type=pa.string())
+            if pc.all(pc.string_is_ascii(arr)).as_py() is not False:
+                valid = pc.match_substring_regex(arr, pattern.pattern)
+                return (~valid.to_numpy(zero_copy_only=False)).sum()
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+            pass  # pattern not supported by RE2, use python's re
+    return (~str_data.str.match(pattern, na=False)).sum()
+
+
+def comp(df: pd.DataFrame, kinds: Optional[dict] = None) -> dict:
     """Enhanced Completeness: % of non-null values per column with additional metrics"""
     if len(df) == 0:
         return {}
     
-    completeness = {}
-    for col in df.columns:
-        non_null_count = df[col].notna().sum()
-        null_count = df[col].isna().sum()
-        empty_string_count = (df[col].astype(str).str.strip() == '').sum() if df[col].dtype == 'object' else 0
-        
-        completeness[col] = {
-            "percentage": round((non_null_count / len(df)) * 100, 2),
-            "non_null_count": int(non_null_count),
-            "null_count": int(null_count),
-            "empty_string_count": int(empty_string_count),
-            "total_rows": len(df)
-        }
+    return map_columns(_comp_column, df, kinds)
+
+
+def _comp_column(col, series: pd.Series, total_rows: int, kind: ColumnKind) -> dict:
+    non_null_count = series.notna().sum()
+    null_count = total_rows - non_null_count
+    # missing values never count as empty strings, so only the present ones are stripped
+    empty_string_count = series.dropna().astype(str).str.strip().eq('').sum() if kind.is_text else 0
     
-    return completeness
+    return {
+        "percentage": round((non_null_count / total_rows) * 100, 2),
+        "non_null_count": int(non_null_count),
+        "null_count": int(null_count),
+        "empty_string_count": int(empty_string_count),
+        "total_rows": total_rows
+    }
 
 
 def dup(df: pd.DataFrame) -> dict:
@@ -45,13 +135,17 @@ def dup(df: pd.DataFrame) -> dict:
     unique_rows = len(df) - duplicate_rows
     
     # Find columns with high duplication rates
+    # every value after the first occurrence is a duplicate (missing values included, like duplicated())
+    distinct = df.nunique(dropna=False)
+    dup_counts = len(df) - distinct
+    # None, NaN, NA and NaT are told apart by nunique(dropna=False), so the present values are counted on their own
+    unique_values = df.nunique()
     column_duplicates = {}
-    for col in df.columns:
-        col_duplicates = df[col].duplicated().sum()
+    for col, col_duplicates, n_unique in zip(df.columns, dup_counts, unique_values):
         column_duplicates[col] = {
             "duplicate_count": int(col_duplicates),
             "duplicate_percentage": round((col_duplicates / len(df)) * 100, 2),
-            "unique_values": int(df[col].nunique())
+            "unique_values": int(n_unique)
         }
     
     return {
@@ -63,174 +157,142 @@ def dup(df: pd.DataFrame) -> dict:
     }
 
 
-def cons(df: pd.DataFrame) -> dict:
+def cons(df: pd.DataFrame, kinds: Optional[dict] = None) -> dict:
     """Enhanced Consistency: comprehensive validation with data type detection"""
     if len(df) == 0:
         return {}
     
-    consistency = {}
-    
-    for col in df.columns:
-        col_data = df[col].dropna()
-        if len(col_data) == 0:
-            consistency[col] = {
-                "invalid_count": 0,
-                "invalid_percentage": 0,
-                "data_type": "empty",
-                "format_issues": [],
-                "suggestions": []
-            }
-            continue
-            
-        invalid_count = 0
-        format_issues = []
-        suggestions = []
-        detected_type = "unknown"
+    return map_columns(_cons_column, df, kinds)
+
+
+def _cons_column(col, series: pd.Series, total_rows: int, kind: ColumnKind) -> dict:
+    col_data = series.dropna()
+    if len(col_data) == 0:
+        return {
+            "invalid_count": 0,
+            "invalid_percentage": 0,
+            "data_type": "empty",
+            "format_issues": [],
+            "suggestions": []
+        }
         
-        if col_data.dtype == "object":
-            str_data = col_data.astype(str).str.strip()
-            col_lower = col.lower()
-            
-            # Email validation
-            if any(keyword in col_lower for keyword in ["email", "mail", "@"]):
-                detected_type = "email"
-                invalid_mask = ~str_data.str.match(EMAIL_RE, na=False)
-                invalid_count = invalid_mask.sum()
-                if invalid_count > 0:
-                    format_issues.append("Invalid email formats detected")
-                    suggestions.append("Ensure emails follow format: user@domain.com")
-            
-            # Phone validation
-            elif any(keyword in col_lower for keyword in ["phone", "tel", "mobile", "cell"]):
-                detected_type = "phone"
+    invalid_count = 0
+    format_issues = []
+    suggestions = []
+    detected_type = "unknown"
+    
+    if kind.is_text:
+        str_data = col_data.astype(str).str.strip()
+        if kind.text_format is not None:
+            detected_type = kind.text_format
+            pattern, issue, suggestion = FORMAT_CHECKS[detected_type]
+            if detected_type == "phone":
                 # Clean phone numbers for validation
-                cleaned_phones = str_data.str.replace(r'[\s\-\(\)]', '', regex=True)
-                invalid_mask = ~cleaned_phones.str.match(PHONE_RE, na=False)
-                invalid_count = invalid_mask.sum()
-                if invalid_count > 0:
-                    format_issues.append("Invalid phone number formats")
-                    suggestions.append("Use international format: +1234567890")
-            
-            # Date validation
-            elif any(keyword in col_lower for keyword in ["date", "time", "created", "updated", "birth"]):
-                detected_type = "date"
-                invalid_mask = ~str_data.str.match(DATE_RE, na=False)
-                invalid_count = invalid_mask.sum()
-                if invalid_count > 0:
-                    format_issues.append("Inconsistent date formats")
-                    suggestions.append("Standardize date format (YYYY-MM-DD recommended)")
-            
-            # URL validation
-            elif any(keyword in col_lower for keyword in ["url", "link", "website", "http"]):
-                detected_type = "url"
-                invalid_mask = ~str_data.str.match(URL_RE, na=False)
-                invalid_count = invalid_mask.sum()
-                if invalid_count > 0:
-                    format_issues.append("Invalid URL formats")
-                    suggestions.append("URLs should start with http:// or https://")
-            
-            # Postal code validation
-            elif any(keyword in col_lower for keyword in ["postal", "zip", "postcode"]):
-                detected_type = "postal_code"
-                invalid_mask = ~str_data.str.upper().str.match(POSTAL_CODE_RE, na=False)
-                invalid_count = invalid_mask.sum()
-                if invalid_count > 0:
-                    format_issues.append("Invalid postal code formats")
-                    suggestions.append("Use standard postal code format for your region")
-            
-            # General text analysis
-            else:
-                detected_type = "text"
-                # Check for excessive whitespace
-                excessive_whitespace = str_data.str.contains(r'\s{2,}', regex=True).sum()
-                if excessive_whitespace > 0:
-                    format_issues.append(f"{excessive_whitespace} entries with excessive whitespace")
-                    suggestions.append("Remove extra spaces and normalize whitespace")
-                
-                # Check for special characters that might indicate encoding issues
-                encoding_issues = str_data.str.contains(r'[^\x00-\x7F]', regex=True).sum()
-                if encoding_issues > 0:
-                    format_issues.append(f"{encoding_issues} entries with special characters")
+                str_data = str_data.str.replace(PHONE_CLEAN_RE, '', regex=True)
+            elif detected_type == "postal_code":
+                str_data = str_data.str.upper()
+            invalid_count = count_invalid(str_data, pattern)
+            if invalid_count > 0:
+                format_issues.append(issue)
+                suggestions.append(suggestion)
         
-        # Numeric data analysis
-        elif col_data.dtype in ['int64', 'float64']:
-            detected_type = "numeric"
-            # Check for outliers using IQR method
-            Q1 = col_data.quantile(0.25)
-            Q3 = col_data.quantile(0.75)
+        # General text analysis
+        else:
+            detected_type = "text"
+            # Check for excessive whitespace
+            excessive_whitespace = str_data.str.contains(WHITESPACE_RE).sum()
+            if excessive_whitespace > 0:
+                format_issues.append(f"{excessive_whitespace} entries with excessive whitespace")
+                suggestions.append("Remove extra spaces and normalize whitespace")
+            
+            # Check for special characters that might indicate encoding issues
+            encoding_issues = str_data.str.contains(NON_ASCII_RE).sum()
+            if encoding_issues > 0:
+                format_issues.append(f"{encoding_issues} entries with special characters")
+    
+    # Numeric data analysis
+    elif kind.is_numeric:
+        detected_type = "numeric"
+        # Check for outliers using IQR method (meaningless on a handful of values, so skipped there)
+        if len(col_data) >= MIN_OUTLIER_SAMPLES:
+            Q1, Q3 = col_data.quantile([0.25, 0.75])
             IQR = Q3 - Q1
             outliers = ((col_data < (Q1 - 1.5 * IQR)) | (col_data > (Q3 + 1.5 * IQR))).sum()
             
             if outliers > 0:
                 format_issues.append(f"{outliers} potential outliers detected")
                 suggestions.append("Review outlier values for data entry errors")
-        
-        consistency[col] = {
-            "invalid_count": int(invalid_count),
-            "invalid_percentage": round((invalid_count / len(col_data)) * 100, 2) if len(col_data) > 0 else 0,
-            "data_type": detected_type,
-            "format_issues": format_issues,
-            "suggestions": suggestions,
-            "total_valid_entries": len(col_data)
-        }
     
-    return consistency
+    return {
+        "invalid_count": int(invalid_count),
+        "invalid_percentage": round((invalid_count / len(col_data)) * 100, 2) if len(col_data) > 0 else 0,
+        "data_type": detected_type,
+        "format_issues": format_issues,
+        "suggestions": suggestions,
+        "total_valid_entries": len(col_data)
+    }
 
 
-def data_profiling(df: pd.DataFrame) -> dict:
+def data_profiling(df: pd.DataFrame, kinds: Optional[dict] = None) -> dict:
     """Comprehensive data profiling with statistical insights"""
     if len(df) == 0:
         return {}
     
-    profiling = {}
+    return map_columns(_profile_column, df, kinds)
+
+
+def _profile_column(col, series: pd.Series, total_rows: int, kind: ColumnKind) -> dict:
+    col_data = series.dropna()
+    unique_count = col_data.nunique()
+    profile = {
+        "column_name": col,
+        "data_type": str(series.dtype),
+        "total_count": total_rows,
+        "non_null_count": len(col_data),
+        "null_count": series.isna().sum(),
+        "unique_count": unique_count,
+        "duplicate_count": len(col_data) - unique_count
+    }
     
-    for col in df.columns:
-        col_data = df[col].dropna()
-        profile = {
-            "column_name": col,
-            "data_type": str(df[col].dtype),
-            "total_count": len(df),
-            "non_null_count": len(col_data),
-            "null_count": df[col].isna().sum(),
-            "unique_count": df[col].nunique(),
-            "duplicate_count": len(col_data) - df[col].nunique()
-        }
+    if len(col_data) > 0:
+        # For numeric columns
+        if kind.is_numeric:
+            profile.update({
+                "min_value": float(col_data.min()),
+                "max_value": float(col_data.max()),
+                "mean": float(col_data.mean()),
+                "median": float(col_data.median()),
+                "std_dev": float(col_data.std()) if len(col_data) > 1 else 0
+            })
         
-        if len(col_data) > 0:
-            # For numeric columns
-            if col_data.dtype in ['int64', 'float64']:
-                profile.update({
-                    "min_value": float(col_data.min()),
-                    "max_value": float(col_data.max()),
-                    "mean": float(col_data.mean()),
-                    "median": float(col_data.median()),
-                    "std_dev": float(col_data.std()) if len(col_data) > 1 else 0
-                })
-            
-            # For text columns
-            elif col_data.dtype == 'object':
-                str_lengths = col_data.astype(str).str.len()
-                profile.update({
-                    "min_length": int(str_lengths.min()),
-                    "max_length": int(str_lengths.max()),
-                    "avg_length": round(str_lengths.mean(), 2),
-                    "most_common": str(col_data.value_counts().index[0]) if len(col_data) > 0 else "",
-                    "most_common_count": int(col_data.value_counts().iloc[0]) if len(col_data) > 0 else 0
-                })
-        
-        profiling[col] = profile
+        # For text columns
+        elif kind.is_text:
+            str_lengths = col_data.astype(str).str.len()
+            counts = col_data.value_counts()
+            profile.update({
+                "min_length": int(str_lengths.min()),
+                "max_length": int(str_lengths.max()),
+                "avg_length": round(str_lengths.mean(), 2),
+                "most_common": str(counts.index[0]) if len(counts) > 0 else "",
+                "most_common_count": int(counts.iloc[0]) if len(counts) > 0 else 0
+            })
     
-    return profiling
+    return profile
 
 
-def data_quality_score(df: pd.DataFrame) -> dict:
-    """Calculate overall data quality score based on multiple factors"""
+def data_quality_score(df: pd.DataFrame, completeness_data=None, duplicates_data=None, consistency_data=None) -> dict:
+    """Calculate overall data quality score based on multiple factors
+    Indicators already computed by comp/dup/cons can be passed in so they are not computed again
+    """
     if len(df) == 0:
         return {"overall_score": 0, "category": "Poor", "factors": {}}
     
-    completeness_data = comp(df)
-    duplicates_data = dup(df)
-    consistency_data = cons(df)
+    if completeness_data is None:
+        completeness_data = comp(df)
+    if duplicates_data is None:
+        duplicates_data = dup(df)
+    if consistency_data is None:
+        consistency_data = cons(df)
     
     # Calculate component scores
     completeness_score = sum([col["percentage"] for col in completeness_data.values()]) / len(completeness_data) if completeness_data else 0
@@ -302,12 +364,16 @@ def quality(df: pd.DataFrame) -> dict:
     """Compute comprehensive quality indicators with enhanced metrics
     If any others where to be added just define the indicator into a function and then add it the return dictionary
     """
+    kinds = classify_columns(df)  # every indicator below reuses the same per-column classification
+    completeness = comp(df, kinds)
+    duplicates = dup(df)
+    consistency = cons(df, kinds)
     return {
-        "completeness": comp(df),
-        "duplicates": dup(df),
-        "consistency": cons(df),
-        "data_profiling": data_profiling(df),
-        "quality_score": data_quality_score(df),
+        "completeness": completeness,
+        "duplicates": duplicates,
+        "consistency": consistency,
+        "data_profiling": data_profiling(df, kinds),
+        "quality_score": data_quality_score(df, completeness, duplicates, consistency),
         "summary": {
             "total_rows": len(df),
             "total_columns": len(df.columns) if not df.empty else 0,
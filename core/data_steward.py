@@ -1,9 +1,12 @@
 import re
+import os
 import math
 import json
+import numpy as np
 import pandas as pd
 from typing import Dict, Any
 from collections import defaultdict
+from functools import lru_cache
 from datetime import datetime
 
 from .logic import get_analyzer
@@ -29,15 +32,18 @@ def load_jobs_map(csv_path: str) -> Dict[str, str]:
     """
     Load 'assets/generelized_jobs.csv' with columns: Job Title,Category
     Build a case-insensitive dict: normalized_title -> category
+    The mapping is cached until the file is modified, so it must not be mutated by callers
     """
+    return _load_jobs_map(csv_path, os.path.getmtime(csv_path))
+
+
+@lru_cache(maxsize=4)
+def _load_jobs_map(csv_path: str, mtime: float) -> Dict[str, str]:
     df = pd.read_csv(csv_path, dtype=str).fillna("")
-    mapping = {}
-    for _, row in df.iterrows():
-        title = row.get("Job Title", "").strip().lower()
-        cat = row.get("Category", "").strip()
-        if title:
-            mapping[title] = cat
-    return mapping
+    titles = df["Job Title"].str.strip().str.lower()
+    cats = df["Category"].str.strip()
+    keep = titles != ""
+    return dict(zip(titles[keep], cats[keep]))
 
 
 def generalize_job_from_map(title: str, jobs_map: Dict[str, str], default="other"):
@@ -51,6 +57,19 @@ def generalize_job_from_map(title: str, jobs_map: Dict[str, str], default="other
     return jobs_map.get(t, default)
 
 
+def generalize_jobs(series: pd.Series, jobs_map: Dict[str, str], default="other") -> pd.Series:
+    """
+    Column version of generalize_job_from_map: one vectorized lookup instead of a call per cell.
+    Missing values are kept as they are
+    """
+    present = series.notna()
+    titles = series[present].astype(str).str.strip().str.lower()
+    generalized = titles.map(jobs_map).fillna(default)
+    out = series.astype(object)
+    out[present] = generalized
+    return out
+
+
 # Regex only used as fallback if parsing fails
 _DATE_RE = re.compile(
     r"""^\s*(
@@ -99,6 +118,87 @@ def generalize_date_to_decade(val: str):
     return val
 
 
+def generalize_dates(series: pd.Series) -> pd.Series:
+    """
+    Column version of generalize_date_to_decade: each format is tried on the whole column with
+    pd.to_datetime instead of a strptime loop per cell, the regex fallback runs with the str methods.
+    Values that can't be parsed (and missing values) are kept as they are
+    """
+    positions = np.flatnonzero(series.notna().to_numpy())
+    s = series.iloc[positions].astype(str).str.strip().reset_index(drop=True)
+    years = pd.Series(np.nan, index=s.index)
+    for fmt in _DATE_FORMATS:
+        todo = years.isna()
+        if not todo.any():
+            break
+        years[todo] = pd.to_datetime(s[todo], format=fmt, errors="coerce").dt.year
+    # Fallback: regex + first 4 digits
+    todo = years.isna()
+    if todo.any():
+        rest = s[todo]
+        rest = rest[rest.str.match(_DATE_RE.pattern, flags=_DATE_RE.flags)]  # pandas drops the flags of a compiled pattern
+        years[rest.index] = pd.to_numeric(rest.str.extract(r"(\d{4})", expand=False), errors="coerce")
+    parsed = years.dropna()
+    out = series.astype(object)
+    out.iloc[positions[parsed.index]] = (((parsed // 10) * 10).astype(int).astype(str) + "s").to_numpy()
+    return out
+
+
+def _do_fill(series: pd.Series, cfg: Dict[str, Any], ctx: Dict[str, Any]) -> pd.Series:
+    choice = cfg.get("value")
+    numeric_ratio = 0
+    if choice in {"mean", "median", "max", "min"}:
+        try_num = pd.to_numeric(series, errors="coerce")
+        is_num = try_num.notna()
+        numeric_ratio = is_num.sum() / len(series) if len(series) else 0
+    if numeric_ratio > 0.5:
+        # the aggregates run on the numbers only, nothing else has to be skipped
+        nums = try_num[is_num]
+        if choice == "mean":
+            fill_val = nums.mean()
+        elif choice == "median":
+            fill_val = nums.median()
+        elif choice == "max":
+            fill_val = nums.max()
+        else:
+            fill_val = nums.min()
+        return series.fillna(fill_val)
+    if choice == "mode":
+        mode_vals = series.mode(dropna=True)
+        fill_val = mode_vals.iloc[0] if not mode_vals.empty else ""
+        return series.fillna(fill_val)
+    custom_val = to_number_if_possible(choice)
+    return series.fillna(custom_val)
+
+
+def _do_mask(series: pd.Series, cfg: Dict[str, Any], ctx: Dict[str, Any]) -> pd.Series:
+    return pd.Series(full_analyze_mask(series, get_analyzer()), index=series.index)
+
+
+def _do_generalize(series: pd.Series, cfg: Dict[str, Any], ctx: Dict[str, Any]) -> pd.Series:
+    # the first non-null value of the original column decides between date and job
+    source = ctx["source"][series.name]
+    present = source.notna().to_numpy()
+    sample_val = str(source.iloc[present.argmax()]) if present.any() else ""
+    if _DATE_RE.match(sample_val):
+        return generalize_dates(series)
+    return generalize_jobs(series, load_jobs_map(ctx["jobs_csv_path"]))
+
+
+def _do_categorize(series: pd.Series, cfg: Dict[str, Any], ctx: Dict[str, Any]) -> pd.Series:
+    return series.astype("category")
+
+
+# action -> handler(series, cfg, ctx) returning the new column, applied in this order.
+# drop is handled before them since it removes the column
+ACTION_HANDLERS = {
+    "fill": _do_fill,
+    "mask": _do_mask,
+    "generalize": _do_generalize,
+    "categorize": _do_categorize,
+}
+
+
 def apply_recommendations(
     df: pd.DataFrame,
     feedback: Dict[str, Dict[str, Dict[str, Any]]],
@@ -107,78 +207,29 @@ def apply_recommendations(
     """
     Apply steward feedback to a *copy* of df.
     """
-    out = df.copy(deep=True)
-
-    analyzer = get_analyzer()
-    jobs_map = load_jobs_map(jobs_csv_path)
+    # shallow copy: untouched columns share their data with df.
+    # never mutate a column in place, always reassign out[col]
+    out = df.copy(deep=False)
+    feedback = feedback or {}
+    # the analyzer and the jobs map are only loaded (once, both are cached) by the actions that need them
+    ctx = {"source": df, "jobs_csv_path": jobs_csv_path}
 
     # --- Drops ---
     cols_to_drop = []
-    for col, actions in (feedback or {}).items():
+    for col, actions in feedback.items():
         act = actions.get("drop")
         if act and act.get("status") == "accepted" and col in out.columns:
             cols_to_drop.append(col)
     if cols_to_drop:
-        out = out.drop(columns=[c for c in cols_to_drop if c in out.columns])
+        out = out.drop(columns=cols_to_drop)
 
     # --- Other actions ---
-    for col, actions in (feedback or {}).items():
+    for col, actions in feedback.items():
         if col not in out.columns:
             continue
-
-        # Fill
-        fill_cfg = actions.get("fill")
-        if fill_cfg and fill_cfg.get("status") == "accepted":
-            choice = fill_cfg.get("value")
-            series = out[col]
-            try_num = pd.to_numeric(series, errors="coerce")
-            numeric_ratio = try_num.notna().mean()
-
-            if choice in {"mean", "median", "max", "min"} and numeric_ratio > 0.5:
-                if choice == "mean":
-                    fill_val = try_num.mean()
-                elif choice == "median":
-                    fill_val = try_num.median()
-                elif choice == "max":
-                    fill_val = try_num.max()
-                else:
-                    fill_val = try_num.min()
-                out[col] = series.fillna(fill_val)
-            elif choice == "mode":
-                mode_vals = series.mode(dropna=True)
-                fill_val = mode_vals.iloc[0] if not mode_vals.empty else ""
-                out[col] = series.fillna(fill_val)
-            else:
-                custom_val = to_number_if_possible(choice)
-                out[col] = series.fillna(custom_val)
-
-        # Mask
-        mask_cfg = actions.get("mask")
-        if mask_cfg and mask_cfg.get("status") == "accepted":
-            if analyzer is None:
-                analyzer = get_analyzer()
-            out[col] = pd.Series(full_analyze_mask(out[col], analyzer), index=out.index)
-
-        # Generalize
-        gen_cfg = actions.get("generalize")
-        if gen_cfg and gen_cfg.get("status") == "accepted":
-            sample_val = str(df[col].dropna().iloc[0]) if not df[col].dropna().empty else ""
-            gen_type = "date" if _DATE_RE.match(sample_val) else "job"
-            if gen_type == "job":
-                out[col] = out[col].apply(lambda v: generalize_job_from_map(v, jobs_map))
-            elif gen_type == "date":
-                out[col] = out[col].apply(generalize_date_to_decade)
-            else:
-                s = out[col].astype(str)
-                date_like = s.str.match(_DATE_RE).mean()
-                if date_like >= 0.5:
-                    out[col] = out[col].apply(generalize_date_to_decade)
-                else:
-                    out[col] = out[col].apply(lambda v: generalize_job_from_map(v, jobs_map))
-
-        # Categorize
-        cat_cfg = actions.get("categorize")
-        if cat_cfg and cat_cfg.get("status") == "accepted":
-            out[col] = out[col].astype("category")
+        for name, handler in ACTION_HANDLERS.items():
+            cfg = actions.get(name)
+            if cfg and cfg.get("status") == "accepted":
+                out[col] = handler(out[col], cfg, ctx)
 
     return out
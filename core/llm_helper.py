@@ -2,8 +2,12 @@
 core/llm_helpers_min.py
 
 Ultra‑simple helpers for ONE‑SHOT prompts.
-- ask_ollama(prompt, model?)  -> str   # uses `ollama run <model>` CLI
-- ask_openai(prompt, api_key?, model?) -> str   # hits OpenAI Chat Completions
+- ask_ollama(prompt, model?, system?)  -> str   # hits the local Ollama server (/api/generate)
+- ask_openai(prompt, api_key?, model?, system?) -> str   # hits OpenAI Chat Completions
+
+`system` is an optional system prompt sent apart from the prompt: keep it identical between
+calls so the server can reuse its cached prefix (Ollama keeps the context of the loaded model,
+OpenAI caches repeated prompt prefixes).
 
 No histories, no streaming, minimal error strings you can show in UI.
 
@@ -11,12 +15,18 @@ Quick setup
 -----------
 1) (optional) `uv pip install python-dotenv` and create a `.env` with:
    OLLAMA_MODEL=mistral:latest
+   OLLAMA_HOST=http://localhost:11434
+   OLLAMA_USE_CLI=0           # 1 = spawn `ollama run <model>` per prompt instead
+   OLLAMA_KEEP_ALIVE=30m      # how long the server keeps the model (and its prompt cache) loaded
    OPENAI_API_KEY=sk-...
    OPENAI_MODEL=gpt-4o-mini
    OPENAI_BASE_URL=https://api.openai.com/v1
    OPENAI_TEMPERATURE=0.2
    OPENAI_MAX_TOKENS=512
    LLM_TIMEOUT_SEC=60
+   LLM_CACHE=1                # 0 = don't reuse answers of identical prompts
+   PRESIDIO_LLM_CACHE=0       # 1 = also keep the recommendation answers on disk (LLM_CACHE_PATH), they hold data values
+   LLM_CONCURRENCY=8          # requests in flight at once in ask_llm_batch
 2) Make sure `ollama` is installed if you use the local path:
    ollama serve
    ollama pull mistral:latest
@@ -24,12 +34,23 @@ Quick setup
 from __future__ import annotations
 
 import os
-import json
+import socket
 import subprocess
 import shutil
-import urllib.request
-import urllib.error
-from typing import Optional
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import requests
+
+# orjson is optional (see requirements.txt): parses the response bytes directly, faster than json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # load .env if python-dotenv is present (safe if not installed)
 try:  # pragma: no cover
@@ -38,11 +59,52 @@ try:  # pragma: no cover
 except Exception:
     pass
 
-__all__ = ["ask_ollama", "ask_openai", "ask_llm"]
+__all__ = ["ask_ollama", "ask_openai", "ask_llm", "ask_llm_batch"]
+
+# kept-alive HTTP sessions reused by every call (no new TCP/TLS handshake per prompt).
+# the direct one ignores the proxy env vars (OPENAI_BYPASS_PROXY=1)
+_SESSION = requests.Session()
+_DIRECT_SESSION = requests.Session()
+_DIRECT_SESSION.trust_env = False
+
+
+def _json_body(resp: requests.Response):
+    """Parse a JSON response body straight from its bytes (no decode to str first with orjson)."""
+    if orjson is not None:
+        return orjson.loads(resp.content)
+    return resp.json()
+
+
+DNS_CHECK_TTL = 300.0  # seconds a successful lookup of the API host is trusted before resolving it again
+_dns_ok: dict = {}  # host -> time.monotonic() of its last successful lookup
+
+
+def _check_dns(host: str) -> None:
+    """Resolve `host` unless it resolved less than DNS_CHECK_TTL seconds ago.
+    Only successful lookups are remembered, a failure raises and is checked again on the next call."""
+    resolved = _dns_ok.get(host)
+    if resolved is not None and time.monotonic() - resolved < DNS_CHECK_TTL:
+        return
+    socket.getaddrinfo(host, 443)
+    _dns_ok[host] = time.monotonic()
+
+
+def _ollama_generate_url() -> str:
+    host = (os.getenv("OLLAMA_HOST") or "http://localhost:11434").strip().rstrip("/")
+    if "://" not in host:
+        # the ollama CLI also accepts a bare host or host:port, it is http on port 11434 by default
+        host = f"http://{host}"
+        parts = urllib.parse.urlsplit(host)
+        if parts.port is None:
+            host = parts._replace(netloc=f"{parts.netloc}:11434").geturl()
+    return f"{host}/api/generate"
 
 
-def ask_ollama(prompt: str, model: Optional[str] = None) -> str:
-    """Send `prompt` to local Ollama via CLI and return the output text.
+def ask_ollama(prompt: str, model: Optional[str] = None, system: Optional[str] = None) -> str:
+    """Send `prompt` to local Ollama and return the output text.
+
+    Talks to the Ollama server over HTTP (kept-alive session); set OLLAMA_USE_CLI=1
+    to go through the `ollama run` CLI instead.
 
     Example:
         ask_ollama("Say hi in one short sentence.")
@@ -51,6 +113,30 @@ def ask_ollama(prompt: str, model: Optional[str] = None) -> str:
         return "[ollama] empty prompt"
 
     model = model or os.getenv("OLLAMA_MODEL", "mistral:latest")
+    if os.getenv("OLLAMA_USE_CLI", "0") == "1":
+        return _ask_ollama_cli(system + "\n" + prompt if system else prompt, model)
+
+    body = {"model": model, "prompt": prompt, "stream": False, "keep_alive": os.getenv("OLLAMA_KEEP_ALIVE", "30m")}
+    if system:
+        body["system"] = system
+    try:
+        resp = _SESSION.post(
+            _ollama_generate_url(),
+            json=body,
+            timeout=float(os.getenv("LLM_TIMEOUT_SEC", "1200")),
+        )
+        if resp.status_code >= 400:
+            return f"[ollama] {resp.status_code} {resp.text[:200]}"
+        return _json_body(resp).get("response", "").strip()
+    except requests.Timeout:
+        return "[ollama] timeout"
+    except requests.ConnectionError as e:
+        return f"[ollama] connection error (is `ollama serve` running?): {e}"
+    except Exception as e:  # keep it blunt/simple
+        return f"[ollama] error: {e}"
+
+
+def _ask_ollama_cli(prompt: str, model: str) -> str:
     ollama_bin = shutil.which("ollama") or "ollama"
 
     try:
@@ -77,9 +163,12 @@ def ask_ollama(prompt: str, model: Optional[str] = None) -> str:
         return f"[ollama] error: {e}"
 
 
-def ask_openai(prompt: str, api_key: Optional[str] = None, model: Optional[str] = None) -> str:
-    import os, json, socket, urllib.parse, urllib.request, urllib.error
-
+def ask_openai(
+    prompt: str,
+    api_key: Optional[str] = None,
+    model: Optional[str] = None,
+    system: Optional[str] = None,
+) -> str:
     if not isinstance(prompt, str) or not prompt.strip():
         return "[openai] empty prompt"
 
@@ -96,48 +185,48 @@ def ask_openai(prompt: str, api_key: Optional[str] = None, model: Optional[str]
     # DNS sanity check
     host = urllib.parse.urlparse(base_url).hostname or "api.openai.com"
     try:
-        socket.getaddrinfo(host, 443)
+        _check_dns(host)
     except OSError as se:
         return f"[openai] DNS cannot resolve {host}: {se}"
 
     # Optionally bypass proxies if env says so (set OPENAI_BYPASS_PROXY=1)
-    if os.getenv("OPENAI_BYPASS_PROXY", "0") == "1":
-        urllib.request.install_opener(urllib.request.build_opener(
-            urllib.request.ProxyHandler({})
-        ))
+    session = _DIRECT_SESSION if os.getenv("OPENAI_BYPASS_PROXY", "0") == "1" else _SESSION
 
     url = f"{base_url}/chat/completions"
     payload = {
         "model": model,
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": ([{"role": "system", "content": system}] if system else []) + [{"role": "user", "content": prompt}],
         "temperature": temperature,
         "max_tokens": max_tokens,
         "stream": False,
     }
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url, data=data,
-        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-        method="POST",
-    )
 
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            body = resp.read().decode("utf-8")
-            obj = json.loads(body)
-            return obj.get("choices", [{}])[0].get("message", {}).get("content", "")
-    except urllib.error.HTTPError as e:
-        try:
-            detail = e.read().decode("utf-8")
-        except Exception:
-            detail = ""
-        return f"[openai] {e.code} {detail[:200]}"
-    except urllib.error.URLError as e:
-        return f"[openai] connection error to {host}: {getattr(e, 'reason', e)}"
+        resp = session.post(url, json=payload, headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}, timeout=timeout)
+        if resp.status_code >= 400:
+            return f"[openai] {resp.status_code} {resp.text[:200]}"
+        obj = _json_body(resp)
+        return obj.get("choices", [{}])[0].get("message", {}).get("content", "")
+    except (requests.ConnectionError, requests.Timeout) as e:
+        return f"[openai] connection error to {host}: {e}"
     except Exception as e:
         return f"[openai] error: {e}"
 
 
+# Answers of identical prompts, (method, model, system, prompt) -> answer, least recently used first.
+# Error strings ("[ollama] ...", "[openai] ...") are never stored so failures are retried.
+LLM_CACHE_SIZE = 256
+_llm_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_llm_cache_lock = threading.Lock()
+
+
+def _ask_uncached(prompt: str, m: str, api_key: Optional[str], model: Optional[str], system: Optional[str]) -> str:
+    if m == "openai":
+        return ask_openai(prompt, api_key=api_key, model=model, system=system)
+    # default to ollama
+    return ask_ollama(prompt, model=model, system=system)
+
+
 # Convenience dispatcher
 # Decide which engine to use.
 # Prefer the explicit `method` argument; otherwise read LLM_METHOD/LLM_PROVIDER from the environment.
@@ -147,13 +236,58 @@ def ask_llm(
     method: Optional[str] = None,
     api_key: Optional[str] = None,
     model: Optional[str] = None,
+    system: Optional[str] = None,
 ) -> str:
     """Dispatch to Ollama or OpenAI.
 
     method: 'ollama' or 'openai'. If None, uses LLM_METHOD or LLM_PROVIDER env (default 'ollama').
+    system: optional system prompt, sent apart from `prompt`.
+    Answers are kept in an in-process LRU cache unless LLM_CACHE=0; see ask_llm.cache_clear().
     """
     m = (method or os.getenv("LLM_METHOD") or os.getenv("LLM_PROVIDER") or "ollama").lower()
-    if m == "openai":
-        return ask_openai(prompt, api_key=api_key, model=model)
-    # default to ollama
-    return ask_ollama(prompt, model=model)
+    if os.getenv("LLM_CACHE", "1") != "1" or not isinstance(prompt, str) or not prompt.strip():
+        return _ask_uncached(prompt, m, api_key, model, system)
+
+    key = (m, model, system, prompt)
+    with _llm_cache_lock:
+        if key in _llm_cache:
+            _llm_cache.move_to_end(key)
+            return _llm_cache[key]
+
+    answer = _ask_uncached(prompt, m, api_key, model, system)
+    if not answer.startswith(("[ollama]", "[openai]")):
+        with _llm_cache_lock:
+            _llm_cache[key] = answer
+            _llm_cache.move_to_end(key)
+            while len(_llm_cache) > LLM_CACHE_SIZE:
+                _llm_cache.popitem(last=False)
+    return answer
+
+
+def _cache_clear() -> None:
+    """Forget every cached answer (e.g. for a "refresh" in the UI)."""
+    with _llm_cache_lock:
+        _llm_cache.clear()
+
+
+ask_llm.cache_clear = _cache_clear
+
+
+def ask_llm_batch(
+    prompts: List[str],
+    method: Optional[str] = None,
+    api_key: Optional[str] = None,
+    model: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    system: Optional[str] = None,
+) -> List[str]:
+    """ask_llm for several prompts at once, answers in the same order as `prompts`.
+
+    Up to `concurrency` (default LLM_CONCURRENCY, 8) requests are in flight together over the
+    shared session, so N prompts take about N / concurrency round trips instead of N.
+    """
+    concurrency = concurrency or int(os.getenv("LLM_CONCURRENCY", "8"))
+    if len(prompts) < 2 or concurrency < 2:
+        return [ask_llm(p, method=method, api_key=api_key, model=model, system=system) for p in prompts]
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(prompts))) as executor:
+        return list(executor.map(lambda p: ask_llm(p, method=method, api_key=api_key, model=model, system=system), prompts))
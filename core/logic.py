@@ -58,7 +58,41 @@ Geolocation data (already exists under LOCATION)
 """
 
 from presidio_analyzer import Pattern, PatternRecognizer, RecognizerResult, EntityRecognizer, AnalyzerEngine
-import spacy, re
+from presidio_analyzer.nlp_engine import NlpEngineProvider
+import spacy, re, os, threading
+import regex # the module presidio's PatternRecognizer compiles its patterns with
+from functools import lru_cache, cache
+from contextlib import contextmanager, nullcontext
+
+# pyahocorasick is optional (see requirements.txt): it finds every keyword of a dictionary in one pass over the text
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# google-re2 is optional too: a linear time engine used to find the candidates of MergedPatternRecognizer
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+@cache
+def compile_pattern(source, flags=0, engine=re):
+    """
+    compiles a pattern once per (source, flags, engine) for the whole process, recognizers that share
+    a pattern or analyzers built again (tests, workers) reuse the same compiled object.
+    unlike the internal caches of re and regex, it is never evicted by other code compiling patterns
+    """
+    return engine.compile(source, flags)
+
+@lru_cache(maxsize=64)
+def lowercase(text):
+    """
+    the custom recognizers all match on the lowercased text. presidio runs them one after the other
+    on the same string, so it is lowercased once per text and shared instead of once per recognizer
+    """
+    return text.lower()
+
 #CIN
 CIN_PATTERN = Pattern(
     name="CIN",
@@ -120,7 +154,7 @@ POSTAL_CODE_RECOGNIZER = PatternRecognizer(
 #Blood Type
 BLOOD_TYPE_PATTERN = Pattern(
     name="Blood Type",
-    regex=r"\b(?:A|B|AB|O)(?:[+-]|(?:\s?(?:positive|negative|pos|neg)))|Rh(?:\s?(?:null|positive|negative|pos|neg))\b",
+    regex=r"\b(?:AB|A|B|O)(?:[+-]|\s?(?:positive|negative|pos|neg)\b)|\bRh\s?(?:null|positive|negative|pos|neg)\b", # longest group first, both branches anchored
     score=0.85)
 #IBAN custome for morocco
 IBAN_PATTERN = Pattern(
@@ -182,20 +216,27 @@ GENDER_RECOGNIZER = PatternRecognizer(
 )
 # this function aimes to detect any implied gender references in the text for future neutralization
 class ImpliedGender(EntityRecognizer):
+    GENDER_WORDS = (
+        "he", "she", "his", "her", "him", "hers",
+        "mr\\.", "mrs\\.", "miss", "ms\\.", "sir", "madam"
+    )
+    # compiled once for every instance. the words are lowercase, so an ascii text is lowercased once and
+    # matched case-sensitively, which is cheaper than letting the engine fold the case at every step.
+    # IGNORECASE is kept for other texts since lower() can change their length (and so the offsets)
+    PATTERN = re.compile(r"\b(" + "|".join(GENDER_WORDS) + r")\b")
+    PATTERN_IGNORECASE = re.compile(r"\b(" + "|".join(GENDER_WORDS) + r")\b", flags=re.IGNORECASE)
+
     def __init__(self):
         super().__init__(supported_entities=["IMPLIED_GENDER"])
-        self.gender_words = {
-            "he", "she", "his", "her", "him", "hers",
-            "mr\\.", "mrs\\.", "miss", "ms\\.", "sir", "madam"
-        }
-        # Precompile regex for performance
-        self.pattern = re.compile(
-            r"\b(" + "|".join(self.gender_words) + r")\b", flags=re.IGNORECASE
-        )
+        self.gender_words = set(self.GENDER_WORDS)
 
     def analyze(self, text, entities, nlp_artifacts=None):
         results = []
-        for match in self.pattern.finditer(text):
+        if text.isascii():
+            matches = self.PATTERN.finditer(lowercase(text))
+        else:
+            matches = self.PATTERN_IGNORECASE.finditer(text)
+        for match in matches:
             results.append(
                 RecognizerResult(
                     entity_type="IMPLIED_GENDER",
@@ -210,7 +251,7 @@ class ImpliedGender(EntityRecognizer):
 # INCOME 
 INCOME_PATTERN = Pattern(
     name="INCOME_PATTERN",
-    regex=r"\b(?:\$|€|MAD|USD|DHS)?\s?\d{3,6}(?:[.,]?\d{3})*(?:\s?(MAD|USD|DHS|EUR|K|k|M|m))?\b",
+    regex=r"\b(?:\$|€|MAD|USD|DHS)?\s?\d{3,6}(?:[.,]?\d{3}){0,3}(?:\s?(?:MAD|USD|DHS|EUR|[KkMm]))?\b", # bounded so long digit runs can't backtrack
     score=0.4  # Base score — context boosts relevance
 )
 
@@ -226,13 +267,128 @@ INCOME_RECOGNIZER = PatternRecognizer(
     name="income_contextual"
 )
 
+# the identifiers that don't rely on context words are matched together by one recognizer
+MERGED_PATTERNS = [
+    ("CIN", CIN_PATTERN),
+    ("PASSPORT", PASSPORT_PATTERN),
+    ("CARTE_DE_SEJOUR", CARTE_DE_SEJOUR_PATTERN),
+    ("BLOOD_TYPE", BLOOD_TYPE_PATTERN),
+    ("TIN", TIN_PATTERN),
+    ("INTERNAL_ID", INTERNAL_ID_PATTERN),
+]
+
+class MergedPatternRecognizer(EntityRecognizer):
+    """
+    this recognizer replaces one PatternRecognizer per entity: all the patterns are joined in a single
+    alternation compiled once, so the text is walked once instead of once per entity.
+    the alternation only finds where something starts, then each pattern is tried at that position
+    so overlapping entities (a passport number is also a CIN) are still all reported
+    """
+    FLAGS = re.DOTALL | re.MULTILINE | re.IGNORECASE # same flags as presidio's PatternRecognizer
+
+    def __init__(self, patterns, name="merged_pattern_recognizer"):
+        super().__init__(supported_entities=[entity for entity, _ in patterns], name=name)
+        self.patterns = [(entity, pattern.score, compile_pattern(pattern.regex, self.FLAGS)) for entity, pattern in patterns]
+        source = "|".join(f"(?:{pattern.regex})" for _, pattern in patterns)
+        self.master = compile_pattern(source, self.FLAGS)
+        self.master_re2 = None
+        if re2 is not None:
+            options = re2.Options()
+            options.case_sensitive = False
+            options.dot_nl = True
+            self.master_re2 = re2.compile(source, options)
+
+    def load(self):
+        pass
+
+    def analyze(self, text, entities, nlp_artifacts=None):
+        results = []
+        metadata = {
+            RecognizerResult.RECOGNIZER_NAME_KEY: self.name,
+            RecognizerResult.RECOGNIZER_IDENTIFIER_KEY: self.id,
+        }
+        # re2's \b only knows ascii letters, so it is used on ascii text only (where both engines agree)
+        if self.master_re2 is not None and text.isascii():
+            master, subject = self.master_re2, text.encode("ascii")
+        else:
+            master, subject = self.master, text
+        found = master.search(subject)
+        while found:
+            start = found.start()
+            for entity, score, pattern in self.patterns:
+                if entities and entity not in entities:
+                    continue
+                match = pattern.match(text, start)
+                if match and match.end() > start:
+                    results.append(
+                        RecognizerResult(
+                            entity_type=entity,
+                            start=start,
+                            end=match.end(),
+                            score=score,
+                            recognition_metadata=dict(metadata),
+                        )
+                    )
+            found = master.search(subject, start + 1)
+        return results
+
+def build_automaton(words):
+    """
+    builds an aho-corasick automaton of the words once, so a text is scanned in a single pass
+    instead of one find() per word. returns None if pyahocorasick is missing or there are no words
+    """
+    words = [w for w in words if w]
+    if ahocorasick is None or not words:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        automaton.add_word(word, len(word))
+    automaton.make_automaton()
+    return automaton
+
+
+def find_words(lowered, words, automaton=None):
+    """
+    yields (start, end) of every occurrence (overlaps included) of the words in the text
+    it uses the automaton when there is one and falls back to str.find per word
+    """
+    if automaton is not None:
+        for end_idx, length in automaton.iter(lowered):
+            yield end_idx - length + 1, end_idx + 1
+        return
+    for word in words:
+        if not word:
+            continue
+        start = lowered.find(word)
+        while start != -1:
+            yield start, start + len(word)
+            start = lowered.find(word, start + 1)
+
+
 #Medical records this is the most challenging one since it can vary a lot so we use a pre-trained model
 _SCI_NLP = None
+_SCI_NLP_LOCK = threading.Lock()
+USE_GPU = os.getenv("PRESIDIO_GPU", "0") == "1" # run the medical model on the gpu (needs cupy, falls back to cpu)
 def _get_sci_nlp():
     global _SCI_NLP
     if _SCI_NLP is None:
-        _SCI_NLP = spacy.load("en_core_sci_sm")
+        with _SCI_NLP_LOCK: # a caller that comes while the model is loading waits for it
+            if _SCI_NLP is None:
+                if USE_GPU:
+                    spacy.prefer_gpu()
+                nlp = spacy.load("en_core_sci_sm")
+                # only the entities are read, the ner has its own tok2vec so the rest of the pipeline is skipped
+                nlp.select_pipes(enable=["ner"])
+                _SCI_NLP = nlp
     return _SCI_NLP
+
+def preload_models():
+    """
+    loads the medical model ahead of time, for long running apps (see the startup of core/backend.py).
+    otherwise it is loaded by the first text analyzed, and a failing load raises there
+    """
+    _get_sci_nlp()
+
 class MedRecRecognizer(EntityRecognizer):
 
     DEFAULT_KEYWORDS = (
@@ -240,26 +396,51 @@ class MedRecRecognizer(EntityRecognizer):
         "asthma", "hypertension", "kidney", "renal", "hepatitis", "hiv",
         "aids", "covid", "infection", "stroke", "depression", "anxiety"
     )
+    CONDITION_LABELS = frozenset({"disease", "condition", "disorder"})
 
     def __init__(self, accept_labels=None, extra_terms=None):
         super().__init__(supported_entities=["MEDICAL_CONDITION"])
-        self.nlp = _get_sci_nlp()
         self.accept_labels = {l.lower() for l in (accept_labels or [])}
         self.extra_terms = {t.lower() for t in (extra_terms or [])}
         self.keywords = {k.lower() for k in self.DEFAULT_KEYWORDS} | self.extra_terms
+        self.automaton = build_automaton(self.keywords)
+        self._docs = {} # text -> doc of the texts being analyzed in a batched() block
 
     def load(self) -> bool: 
         return True
 
+    @property
+    def nlp(self):
+        return _get_sci_nlp()
+
     def analyze(self, text, entities, nlp_artifacts=None):
+        doc = self._docs.get(text)
+        return self.analyze_doc(text, doc if doc is not None else self.nlp(text))
+
+    @contextmanager
+    def batched(self, texts, batch_size=32):
+        """
+        the model runs over the texts in batches with nlp.pipe, the analyze calls made inside the
+        block reuse those docs instead of running the model once per text
+        """
+        todo = [text for text in dict.fromkeys(texts) if text not in self._docs]
+        self._docs.update(zip(todo, self.nlp.pipe(todo, batch_size=batch_size)))
+        try:
+            yield
+        finally:
+            for text in todo:
+                self._docs.pop(text, None)
+
+    def analyze_doc(self, text, doc):
         results = []
-        lowered = text.lower()
+        lowered = lowercase(text)
 
-        doc = self.nlp(text)
         for ent in doc.ents:
-            if ent.label_.lower() in {"disease", "condition", "disorder"}:
-                label_ok = (not self.accept_labels) or (ent.label_.lower() in self.accept_labels)
-                keyword_in_text = any(k in ent.text.lower() for k in self.keywords)
+            label = ent.label_.lower()
+            if label in self.CONDITION_LABELS:
+                label_ok = (not self.accept_labels) or (label in self.accept_labels)
+                ent_text = ent.text.lower()
+                keyword_in_text = any(k in ent_text for k in self.keywords)
 
                 if label_ok or keyword_in_text:
                     score = 0.9 if keyword_in_text else 0.75
@@ -272,100 +453,107 @@ class MedRecRecognizer(EntityRecognizer):
                         )
                     )
 
-        for kw in self.keywords:
-            start = lowered.find(kw)
-            while start != -1:
-                end = start + len(kw)
-                if not any(r.start == start and r.end == end for r in results):
-                    results.append(
-                        RecognizerResult(
-                            entity_type="MEDICAL_CONDITION",
-                            start=start,
-                            end=end,
-                            score=0.6,
-                        )
+        # every keyword is found in one pass, spans already reported by the model are skipped
+        seen = {(r.start, r.end) for r in results}
+        for start, end in find_words(lowered, self.keywords, self.automaton):
+            if (start, end) not in seen:
+                seen.add((start, end))
+                results.append(
+                    RecognizerResult(
+                        entity_type="MEDICAL_CONDITION",
+                        start=start,
+                        end=end,
+                        score=0.6,
                     )
-                start = lowered.find(kw, start + 1)
+                )
 
         return results
 
 
 # job title (just using a dictionary )
-JOBS = set()
-with open("assets/jobs.csv") as f:
-    for line in f:
-        splited = line.strip().split(",")
-        if len(splited) > 3:
-            JOBS.add(splited[2].strip().lower())
+def load_jobs(path="assets/jobs.csv"):
+    """
+    reads the (lowercased) job titles of the occupations csv
+    """
+    titles = set()
+    with open(path) as f:
+        for line in f:
+            splited = line.strip().split(",")
+            if len(splited) > 3:
+                titles.add(splited[2].strip().lower())
+    return frozenset(titles)
 
 
 class JobTitleRecognizer(EntityRecognizer):
     def __init__(self):
         super().__init__(supported_entities=["JOB_TITLE"])
-        self.job_titles = JOBS
+        titles = load_jobs()
+        self.automaton = build_automaton(titles)
+        # the automaton holds its own copy of the titles, the set is only kept for the str.find fallback
+        self.job_titles = () if self.automaton is not None else titles
     def analyze(self, text, entities, nlp_artifacts=None):
         results = []
-        lowered = text.lower()
-        for job in self.job_titles:
-            job = job.lower()
-            if job in lowered:
-                start = lowered.find(job)
-                while start >= 0:
-                    results.append(
-                        RecognizerResult(
-                            entity_type="JOB_TITLE",
-                            start=start,
-                            end=start + len(job),
-                            score=0.8
-                        )
-                    )
-                    start = lowered.find(job, start + 1)
+        lowered = lowercase(text)
+        for start, end in find_words(lowered, self.job_titles, self.automaton):
+            results.append(
+                RecognizerResult(
+                    entity_type="JOB_TITLE",
+                    start=start,
+                    end=end,
+                    score=0.8
+                )
+            )
         return results
 
+def medical_batch(analyzer, texts, batch_size=32):
+    """
+    context where the medical recognizer of the analyzer (if it has one) reuses the docs of one
+    nlp.pipe pass over the texts, see MedRecRecognizer.batched
+    """
+    for recognizer in analyzer.registry.recognizers:
+        if isinstance(recognizer, MedRecRecognizer):
+            return recognizer.batched(texts, batch_size)
+    return nullcontext()
+
+def precompile(recognizer):
+    """
+    presidio compiles each pattern on the first analyze call and keeps it on the Pattern object,
+    this does it ahead with the same module and flags so the first request doesn't pay for it
+    """
+    for pattern in recognizer.patterns:
+        pattern.compiled_regex = compile_pattern(pattern.regex, recognizer.global_regex_flags, regex)
+        pattern.compiled_with_flags = recognizer.global_regex_flags
+    return recognizer
+
+NLP_MODEL = os.getenv("PRESIDIO_NLP_MODEL") # spacy model of the main analyzer, presidio's default when unset
+
 #adding the recognizers to the analyzer
+@lru_cache(maxsize=1)
 def get_analyzer():
-    analyzer = AnalyzerEngine()
-    analyzer.registry.add_recognizer(IBAN_RECOGNIZER)
-    analyzer.registry.add_recognizer(DRIVER_LICENSE_RECOGNIZER)
-    analyzer.registry.add_recognizer(INSURANCE_RECOGNIZER)
-    analyzer.registry.add_recognizer(INCOME_RECOGNIZER)
-    analyzer.registry.add_recognizer(GENDER_RECOGNIZER)
+    """
+    the engine (spacy model + recognizers) is built once per process and shared by every caller
+    PRESIDIO_NLP_MODEL swaps presidio's default spacy model (en_core_web_lg), e.g. en_core_web_sm for quick runs
+    """
+    provider = NlpEngineProvider()
+    if NLP_MODEL:
+        provider.nlp_configuration["models"] = [{"lang_code": "en", "model_name": NLP_MODEL}]
+    analyzer = AnalyzerEngine(nlp_engine=provider.create_engine())
+    # presidio reads the entities, lemmas and stop words of the doc, never the dependency parse
+    for nlp in analyzer.nlp_engine.nlp.values():
+        if "parser" in nlp.pipe_names:
+            nlp.disable_pipe("parser")
+    analyzer.registry.add_recognizer(precompile(IBAN_RECOGNIZER))
+    analyzer.registry.add_recognizer(precompile(DRIVER_LICENSE_RECOGNIZER))
+    analyzer.registry.add_recognizer(precompile(INSURANCE_RECOGNIZER))
+    analyzer.registry.add_recognizer(precompile(INCOME_RECOGNIZER))
+    analyzer.registry.add_recognizer(precompile(GENDER_RECOGNIZER))
     analyzer.registry.add_recognizer(ImpliedGender())
     analyzer.registry.add_recognizer(MedRecRecognizer())
     analyzer.registry.add_recognizer(JobTitleRecognizer())
 
-    analyzer.registry.add_recognizer(PatternRecognizer(
-        supported_entity="CIN",
-        patterns=[CIN_PATTERN]
-    ))
-
-    analyzer.registry.add_recognizer(PatternRecognizer(
-        supported_entity="PASSPORT",
-        patterns=[PASSPORT_PATTERN]
-    ))
-
-    analyzer.registry.add_recognizer(PatternRecognizer(
-        supported_entity="CARTE_DE_SEJOUR",
-        patterns=[CARTE_DE_SEJOUR_PATTERN]
-    ))
-
-    analyzer.registry.add_recognizer(POSTAL_CODE_RECOGNIZER)
-
-    analyzer.registry.add_recognizer(PatternRecognizer(
-        supported_entity="BLOOD_TYPE",
-        patterns=[BLOOD_TYPE_PATTERN]
-    ))
-
-    analyzer.registry.add_recognizer(PatternRecognizer(
-        supported_entity="TIN",
-        patterns=[TIN_PATTERN]
-    ))
-
-    analyzer.registry.add_recognizer(PatternRecognizer(
-        supported_entity="INTERNAL_ID",
-        patterns=[INTERNAL_ID_PATTERN]
-    ))
-    
+    analyzer.registry.add_recognizer(precompile(POSTAL_CODE_RECOGNIZER))
+    analyzer.registry.add_recognizer(MergedPatternRecognizer(MERGED_PATTERNS))
+
     return analyzer
 
 analyzer = get_analyzer()
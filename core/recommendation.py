@@ -26,101 +26,49 @@ Return payload shape:
 }
 
 Notes:
-- Single POC-focused LLM call (no caching/security).
-- Uses ask_llm(prompt) from llm_helper.py (Ollama/OpenAI decided by env).
+- POC-focused LLM calls, a few columns per call, answers cached (see LLM_CACHE_PATH).
+- Uses ask_llm_batch(prompts, system=...) from llm_helper.py (Ollama/OpenAI decided by env).
 - Input prompt enforces: missingness is informational for PII/identifiers; prefer masking; pick at most ONE accepted action per column; do not invent actions.
 """
 from __future__ import annotations
 
 import json
+import atexit
+import hashlib
+import logging
+import pickle
+import queue
+import sqlite3
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import os
+import threading
+from collections import Counter
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-from .csv_pii import score_header, sample_analyze, GDPR_CATEGORIES, MIN_SCORE
+from .csv_pii import score_header, sample_analyze, memo_analyze, get_gdpr_categories, MAX_WORKERS
 from .logic import get_analyzer
-from .llm_helper import ask_llm
-from .util import serialize_recommendation
+from .llm_helper import ask_llm_batch
+from .util import serialize_recommendation, json_safe
+
+# orjson is optional (see requirements.txt): faster parsing of the LLM answers
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 NA_THRESHOLD = 0.6
+FULL_SCAN_BATCH = 256 # distinct values analyzed by full_analyze between two early-stop checks
+MIN_SAMPLE = 200 # rows full_analyze must have analyzed before it can stop early
+MIN_CONFIRM = 50 # hits of the top entity needed to stop early
+CONFIRM_RATIO = 0.8 # share of the analyzed rows with a hit needed to stop early
 GENERALIZED_ENTITIES = ["DATE_TIME", "JOB_TITLE"]
-_LLM_HEADER = """
-SYSTEM
-Return ONLY valid JSON (no Markdown fences, no text outside JSON).
-Top-level keys MUST be the exact column names.
-For each column, include:
-- "text": 2-6 sentences for the data steward. Mention missingness if given, but for PII/identifiers missingness is informational only and does NOT justify filling.
-- "value": object with ONLY the actions that were proposed for that column. For each action:
-   {"status": "accepted"|"rejected", "value": <string|null>}
-The output schema is:
-{
-  "<COLUMN>": {
-    "text": {<the recommendation as a comprehensible text>},
-    "value": {
-        "<action>": {"status":"accepted"|"rejected", "value":<str|null>},
-        ...
-    }
-  },
-  ...
-}
-Rules:
-- ALLOWED_ACTIONS = {fill, mask, generalize, drop, categorize, enrich, keep}
-- PII/identifiers: PERSON, EMAIL_ADDRESS, PHONE_NUMBER, CIN, ID_MAROC, IBAN_CODE, LOCATION, DATE_TIME
-- Prefer mask/generalize for PII/identifiers. Never suggest filling with names/emails/numbers or fabricated identities.
-- Exactly ONE action per column should be "accepted"; others must be "rejected".
-- "value" meaning:
-   • fill → "median"|"mean"|"mode"|approved placeholder string (only for non-PII)
-   • generalize → "year"|"month" etc.
-   • mask/drop/categorize/enrich → usually null
-- Do not invent actions that were not proposed for that column.
-- If information is insufficient, be conservative and state that in "text".
-- You will be provided next we a glossary of PII s and SII s be sure to include them as a reason for your decision.
-{
-  "VERSION": "2025-09-16",
-  "DEFINITIONS": {
-    "PII": "Personal data that can identify or relate to an individual but is not a GDPR Article 9 special category. Requires lawful basis, minimization, and security.",
-    "SII": "Sensitive/special-category personal data (GDPR Art. 9) requiring an additional Article 9(2) condition. In Morocco (Law 09-08), 'données sensibles' typically need CNDP prior authorization."
-  },
-  "ALIASES": {
-    "MIBAN_CODE": "IBAN_CODE"
-  },
-  "ENTITIES": {
-    "PERSON":              {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "EMAIL_ADDRESS":       {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "PHONE_NUMBER":        {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "LOCATION":            {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "medium", "default_action": "mask"},
-    "POSTAL_CODE":         {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "medium", "default_action": "generalize"},
-    "DATE_TIME":           {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "medium", "default_action": "generalize"},
-    "DATE_OF_BIRTH":       {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "generalize"},
-    "AGE":                 {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "low",    "default_action": "generalize"},
-    "JOB_TITLE":           {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "medium", "default_action": "mask"},
-    "NATIONALITY":         {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "medium", "default_action": "mask"},
-
-    "CIN":                 {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": true},  "risk": "critical","default_action": "mask"},
-    "ID_MAROC":            {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": true},  "risk": "critical","default_action": "mask"},
-    "PASSPORT":            {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "DRIVER_LICENSE":      {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "INSURANCE_NUMBER":    {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "INTERNAL_ID":         {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "medium", "default_action": "tokenize"},
-
-    "IBAN_CODE":           {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "BANK_ACCOUNT":        {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "CREDIT_CARD":         {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "critical","default_action": "mask"},
-
-    "HEALTH_DATA":         {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "critical","default_action": "mask"},
-    "MEDICAL_CONDITION":   {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "critical","default_action": "mask"},
-    "BLOOD_TYPE":          {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "high",   "default_action": "mask"},
-    "GENETIC_DATA":        {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "critical","default_action": "mask"},
-    "BIOMETRIC_DATA_ID":   {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "critical","default_action": "mask"},
-    "RACIAL_ETHNIC_ORIGIN":{"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "high",   "default_action": "mask"},
-    "POLITICAL_OPINION":   {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "high",   "default_action": "mask"},
-    "RELIGIOUS_BELIEF":    {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "high",   "default_action": "mask"},
-    "TRADE_UNION_MEMBERSHIP":{"category": "SII","gdpr": {"special_category": true}, "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "high",   "default_action": "mask"},
-    "SEXUAL_ORIENTATION":  {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "critical","default_action": "mask"}
-  }
-}
-INPUT
-"""
+# the steward instructions (and the glossary) sent as the system prompt of every LLM call
+with open("assets/steward_prompt.txt", encoding="utf-8") as f:
+    _LLM_HEADER = f.read().strip()
 
 
 # ────────────────────────────────────────────────────────────────────────────
@@ -130,20 +78,23 @@ INPUT
 def analyze_table_na(df: pd.DataFrame) -> dict:
     """NA-based fills/drops.
     Returns {col: {action, reason, percentage, ...}}
+    The NA ratios come from one isna() pass over the frame and the numeric fill values
+    from one agg() over the numeric columns that need filling.
     """
     recommendations = {}
+    na_ratios = df.isna().mean()
+    to_fill = [c for c in df.columns if 0 < na_ratios[c] < NA_THRESHOLD]
+    # every numeric dtype (int32, float32, nullable Int64...) is filled with mean/median/max/min
+    numeric_cols = set(df.select_dtypes(include="number", exclude="complex").columns)
+    numeric = [c for c in to_fill if c in numeric_cols]
+    stats = df[numeric].agg(["mean", "median", "max", "min"]) if numeric else None
     for column in df.columns:
-        na_percentage = float(df[column].isnull().mean())
+        na_percentage = float(na_ratios[column])
         if na_percentage == 0:
             continue
         if 0 < na_percentage < NA_THRESHOLD:
-            if str(df[column].dtype) in ["float64", "int64", "Float64", "Int64"]:
-                filling = {
-                    "mean": float(df[column].mean()),
-                    "median": float(df[column].median()),
-                    "max": float(df[column].max()),
-                    "min": float(df[column].min()),
-                }
+            if stats is not None and column in stats.columns:
+                filling = {k: float(stats.at[k, column]) for k in ("mean", "median", "max", "min")}
             else:
                 try:
                     mode_val = df[column].mode(dropna=True).iloc[0]
@@ -165,22 +116,49 @@ def analyze_table_na(df: pd.DataFrame) -> dict:
     return recommendations
 
 
-def full_analyze(series: pd.Series, analyzer) -> dict:
+def full_analyze(series: pd.Series, analyzer, memo: Optional[Dict[str, list]] = None) -> dict:
     """PII scan on one column → suggest mask/generalize/keep.
     Returns a dict describing the top detected entities and suggested action.
+    Each distinct value is analyzed once (in nlp.pipe batches, see csv_pii.batch_analyze)
+    and its hits are counted as many times as the value appears.
+    Values already in `memo` (sampled rows, other columns) are not analyzed again.
+    Missing values are skipped, the percentage of PII is relative to the non-missing ones.
+    Columns with many distinct values are analyzed in a random (seeded) order, FULL_SCAN_BATCH
+    values at a time, and the scan stops early once the analyzed rows confirm an entity
+    (see MIN_SAMPLE, MIN_CONFIRM and CONFIRM_RATIO); the result then has "analyzed_rows".
     """
+    values = series.to_numpy()
+    values = values[pd.notna(values)].tolist() # one vectorized NA mask, no Series iteration
+    # first-appearance order, so ties between entities are broken as before
+    occurrences = Counter(v if isinstance(v, str) else str(v) for v in values)
+    texts = list(occurrences)
+    memo = {} if memo is None else memo
+    order = np.random.default_rng(0).permutation(len(texts)) if len(texts) > FULL_SCAN_BATCH else range(len(texts))
+    analyzed: Dict[str, list] = {}
+    running: Counter = Counter()
+    rows = hit_rows = 0
+    for start in range(0, len(texts), FULL_SCAN_BATCH):
+        batch = [texts[k] for k in order[start:start + FULL_SCAN_BATCH]]
+        for text, result in zip(batch, memo_analyze(batch, analyzer, memo)):
+            analyzed[text] = result
+            times = occurrences[text]
+            rows += times
+            if result:
+                hit_rows += times
+                running.update({ent: n * times for ent, n in Counter(r.entity_type for r in result).items()})
+        if (len(analyzed) < len(texts) and rows >= MIN_SAMPLE and hit_rows >= CONFIRM_RATIO * rows
+                and running.most_common(1)[0][1] >= MIN_CONFIRM):
+            break
+
     count = 0
-    entities: Dict[str, int] = {}
-    for v in series:
-        if pd.isna(v):
-            continue
-        result = analyzer.analyze(str(v), language="en")
-        result = [r for r in result if r.score >= MIN_SCORE]
+    entities: Counter = Counter()
+    for text in texts:
+        result = analyzed.get(text)
         if not result:
             continue
-        count += 1
-        for r in result:
-            entities[r.entity_type] = entities.get(r.entity_type, 0) + 1
+        times = occurrences[text]
+        count += times
+        entities.update({ent: n * times for ent, n in Counter(r.entity_type for r in result).items()})
 
     if count == 0:
         return {
@@ -190,15 +168,23 @@ def full_analyze(series: pd.Series, analyzer) -> dict:
             "top_detected_entities": [],
         }
 
-    top_entities = sorted(entities.items(), key=lambda x: x[1], reverse=True)[:3]
+    top_entities = entities.most_common(3)
     top_ent = top_entities[0][0]
-    return {
+    recommendation = {
         "action": "mask" if top_ent not in GENERALIZED_ENTITIES else "generalize",
         "reason": "detected PII entities",
         "guessed_entity": top_ent,
         "top_detected_entities": top_entities,
-        "percentage of PII": (count / max(len(series), 1)) * 100.0,
+        "percentage of PII": (count / max(rows, 1)) * 100.0, # of the analyzed non-missing values
     }
+    if rows < len(values):
+        recommendation["analyzed_rows"] = rows
+    return recommendation
+
+
+def as_text(data):
+    """astype(str) of a column or frame, with the missing values kept missing instead of "nan"."""
+    return data.astype(str).where(data.notna())
 
 
 def process_pii(df: pd.DataFrame) -> dict:
@@ -206,18 +192,33 @@ def process_pii(df: pd.DataFrame) -> dict:
     Returns {col: {action, reason, ...}}
     """
     recommendations: Dict[str, Any] = {}
-    df = df.astype(str)
     headers = df.columns.tolist()
-    rows = df.values.tolist()
 
     analyzer = get_analyzer()
     scores = score_header(headers, threshhold=70)
-    profiled = sample_analyze(headers, rows, analyzer, scores)
-
+    # the cells are analyzed as strings, only the columns that are read get converted.
+    # missing values stay missing (not "nan"), the sampling and the full scans skip them
+    guessed = [header for header in headers if scores[header]["entity"] is not None]
+    texts = as_text(df[guessed])
+    memo: Dict[str, list] = {} # text -> analyzer results, shared by the sampling and the full scans
+    profiled = sample_analyze(headers, texts, analyzer, scores, memo=memo)
+
+    # numeric/bool/datetime columns are only scanned when their header hints at an entity
+    text_headers = set(df.select_dtypes(include=["object", "string", "category"]).columns)
+    to_analyze = [] # columns that need a full analysis
     for header in headers:
         profile_info = profiled.get(header)
+        recommendations[header] = None # keeps the columns order, filled below
+        if not profile_info and header not in text_headers:
+            recommendations[header] = {
+                "action": "keep",
+                "reason": "non-text dtype",
+                "guessed_entity": None,
+                "top_detected_entities": [],
+            }
+            continue
         if not profile_info:
-            recommendations[header] = full_analyze(df[header].rename(header), analyzer)
+            to_analyze.append(header)
             continue
         guessed_entity = profile_info.get("guessed_entity")
         top_entities = profile_info.get("top_detected_entities", [])
@@ -226,29 +227,91 @@ def process_pii(df: pd.DataFrame) -> dict:
             recommendations[header] = {
                 "action": "mask" if guessed_entity not in GENERALIZED_ENTITIES else "generalize",
                 "reason": f"confirmed PII entity: {guessed_entity}",
-                "gdpr_category": GDPR_CATEGORIES.get(guessed_entity, "Uncategorized"),
+                "gdpr_category": get_gdpr_categories().get(guessed_entity, "Uncategorized"),
                 "top_entities": top_entities,
             }
         else:
-            recommendations[header] = full_analyze(df[header], analyzer)
+            to_analyze.append(header)
+
+    # the columns are independent, they are scanned on threads (same as csv_pii.process_csv) that share
+    # the analyzer and the memo. spacy holds the GIL for most of the scan, so the threads mostly overlap
+    # its waits; using more cores is left to the server's worker processes (one analyzer each)
+    if to_analyze:
+        columns = [texts[header] if header in texts else as_text(df[header]) for header in to_analyze]
+        with ThreadPoolExecutor(max_workers=min(len(columns), MAX_WORKERS)) as executor:
+            results = list(executor.map(lambda column: full_analyze(column, analyzer, memo), columns))
+        for header, result in zip(to_analyze, results):
+            recommendations[header] = result
     return recommendations
 
 # Enrichment (header clustering) — unchanged POC
-with open("models/header_encoder.pkl", "rb") as f:
-    sentence_model = pd.read_pickle(f)  # as given in your base code
-with open("models/kmeans_headers.pkl", "rb") as f:
-    kmeans_model = pd.read_pickle(f)
-with open("models/pca_transform.pkl", "rb") as f:
-    pca_model = pd.read_pickle(f)
+def fold_header_models(pca, kmeans):
+    """PCA.transform + KMeans.predict folded into one linear map computed once:
+    cluster = argmin(embeddings @ weights + bias), with the squared distance to each center
+    expanded (the |z|² term is the same for every center so it is dropped).
+    """
+    if getattr(pca, "whiten", False):
+        raise ValueError("whitened PCA can't be folded")
+    centers = kmeans.cluster_centers_.astype(np.float64)
+    to_centers = pca.components_.astype(np.float64).T @ centers.T
+    weights = -2.0 * to_centers
+    bias = 2.0 * pca.mean_.astype(np.float64) @ to_centers + (centers ** 2).sum(axis=1)
+    return weights, bias
+
+HEADER_ENCODER_DIR = "models/header_encoder" # SentenceTransformer.save() output, preferred over the pickle
+
+@lru_cache(maxsize=1)
+def header_models():
+    """Loads the header encoder and the folded PCA/KMeans on first use (and only once)
+    instead of when the module is imported. Returns (encoder, weights, bias).
+    The encoder is read from HEADER_ENCODER_DIR when it exists: its safetensors weights are
+    memory mapped instead of unpickled into the heap of every process."""
+    if os.path.isdir(HEADER_ENCODER_DIR):
+        # only imported when the enrichment runs, torch is slow to import
+        from sentence_transformers import SentenceTransformer
+        sentence_model = SentenceTransformer(HEADER_ENCODER_DIR, device="cpu")
+    else:
+        with open("models/header_encoder.pkl", "rb") as f:
+            sentence_model = pd.read_pickle(f)  # as given in your base code
+    with open("models/kmeans_headers.pkl", "rb") as f:
+        kmeans_model = pd.read_pickle(f)
+    with open("models/pca_transform.pkl", "rb") as f:
+        pca_model = pd.read_pickle(f)
+    return (sentence_model, *fold_header_models(pca_model, kmeans_model))
 
 ENRICHABLE_HEADERS = [2]
+HEADER_CACHE_SIZE = 4096 # headers whose cluster is remembered between files
+_header_clusters: Dict[str, int] = {}
+_header_clusters_lock = threading.Lock()
+
+def header_clusters(headers: List[str]) -> List[int]:
+    """Cluster of each header. The headers not seen before are encoded together in one
+    batch (one encoder call instead of one per column) and their clusters are remembered."""
+    with _header_clusters_lock:
+        known = {h: _header_clusters[h] for h in headers if h in _header_clusters}
+    missing = [h for h in dict.fromkeys(headers) if h not in known]
+    if missing:
+        sentence_model, weights, bias = header_models()
+        embeddings = sentence_model.encode(missing, batch_size=64, show_progress_bar=False, convert_to_numpy=True)
+        clusters = np.argmin(np.asarray(embeddings, dtype=np.float64) @ weights + bias, axis=1)
+        new = {h: int(c) for h, c in zip(missing, clusters)}
+        known.update(new)
+        with _header_clusters_lock:
+            if len(_header_clusters) + len(new) > HEADER_CACHE_SIZE:
+                _header_clusters.clear()
+            _header_clusters.update(new)
+    return [known[h] for h in headers]
 
 def enrich_headers(df: pd.DataFrame) -> dict:
     enrichable = {}
-    for header in df.columns:
-        embedding = sentence_model.encode([header])
-        embedding = pca_model.transform(embedding)
-        cluster = int(kmeans_model.predict(embedding)[0])
+    headers = list(df.columns)
+    try:
+        clusters = header_clusters(headers)
+    except (OSError, ImportError, pickle.UnpicklingError) as e:
+        # a missing/broken model only disables the enrichment, not the other recommendations
+        logging.getLogger(__name__).warning("header models unavailable, no enrichment: %s", e)
+        return enrichable
+    for header, cluster in zip(headers, clusters):
         if cluster in ENRICHABLE_HEADERS:
             enrichable[header] = {
                 "action": "enrich",
@@ -270,24 +333,60 @@ def enrich_headers(df: pd.DataFrame) -> dict:
 
 UNIQNESS_THRESHOLD = 0.05
 MAX_UNIQUE_ABSOLUTE = 50
+LLM_COLUMNS_PER_CALL = 6 # columns sent to the LLM in one prompt, the prompts are sent concurrently
+# the prompts hold values of the data, so their answers are only written to disk when asked for
+LLM_DISK_CACHE = os.getenv("PRESIDIO_LLM_CACHE", "0") == "1" # keep the LLM answers across runs in LLM_CACHE_PATH
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm.sqlite")
+LOG_LLM = os.getenv("PRESIDIO_LOG_LLM", "0") == "1" # append the prompts and answers to LLM_LOG_PATH
+LLM_LOG_PATH = "logs/recommendations.log"
+_json_decoder = json.JSONDecoder()
+
+def block_nunique(arr: np.ndarray) -> np.ndarray:
+    """Distinct non-NaN values of every column of a 2D numeric array, counted with one sort of
+    the whole block (NaN sorts last) instead of a hash table per column."""
+    arr = np.sort(arr, axis=0)
+    change = np.empty(arr.shape, dtype=bool)
+    change[:1] = True
+    np.not_equal(arr[1:], arr[:-1], out=change[1:])
+    if arr.dtype.kind == "f":
+        change &= ~np.isnan(arr)
+    return change.sum(axis=0)
+
+
+def table_nunique(df: pd.DataFrame) -> pd.Series:
+    """df.nunique(dropna=True), with the float64 and int64 columns counted as blocks (block_nunique)
+    so wide numeric tables don't pay a pandas call per column."""
+    counts = np.empty(df.shape[1], dtype=np.int64)
+    rest = np.ones(df.shape[1], dtype=bool)
+    for dtype in (np.dtype("float64"), np.dtype("int64")):
+        block = (df.dtypes == dtype).to_numpy()
+        if block.any():
+            counts[block] = block_nunique(df.iloc[:, block].to_numpy())
+            rest &= ~block
+    if rest.any():
+        counts[rest] = df.iloc[:, rest].nunique(dropna=True).to_numpy()
+    return pd.Series(counts, index=df.columns)
+
 
 def analyze_categorization(df: pd.DataFrame) -> dict:
     recommendations = {}
     total_rows = len(df)
-    for column in df.columns:
-        if total_rows == 0:
-            continue
-        unique_count = int(df[column].nunique(dropna=True))
+    if total_rows == 0:
+        return recommendations
+    # one nunique sweep picks the candidates, value_counts only runs on them
+    nuniques = table_nunique(df)
+    candidates = nuniques[(nuniques / total_rows <= UNIQNESS_THRESHOLD) & (nuniques <= MAX_UNIQUE_ABSOLUTE)]
+    for column, unique_count in candidates.items():
+        unique_count = int(unique_count)
         uniqueness_ratio = unique_count / total_rows
-        if (uniqueness_ratio <= UNIQNESS_THRESHOLD) and (unique_count <= MAX_UNIQUE_ABSOLUTE):
-            top_values = {k: int(v) for k, v in df[column].value_counts().head(5).to_dict().items()}
-            recommendations[column] = {
-                "action": "categorize",
-                "reason": f"Low uniqueness ratio ({uniqueness_ratio:.2f}) and unique count ({unique_count})",
-                "uniqueness_ratio": uniqueness_ratio,
-                "unique_count": unique_count,
-                "example_categories": top_values,
-            }
+        top_values = {k: int(v) for k, v in df[column].value_counts().head(5).to_dict().items()}
+        recommendations[column] = {
+            "action": "categorize",
+            "reason": f"Low uniqueness ratio ({uniqueness_ratio:.2f}) and unique count ({unique_count})",
+            "uniqueness_ratio": uniqueness_ratio,
+            "unique_count": unique_count,
+            "example_categories": top_values,
+        }
     return recommendations
 
 # ────────────────────────────────────────────────────────────────────────────
@@ -305,95 +404,139 @@ def _summarize_extra(rec: dict) -> str:
         if k in rec:
             v = rec[k]
             if isinstance(v, (list, dict)):
-                s = str(v)[:300]
+                s = dump_payload(v)[:300]
             else:
                 s = str(v)
             parts.append(f"{k}={s}")
     return "; ".join(parts) if parts else "none"
 
 
-_LLM_HEADER = """
-SYSTEM
-Return ONLY valid JSON (no Markdown fences, no text outside JSON).
-Top-level keys MUST be the exact column names.
-For each column, include:
-- "text": 2-6 sentences for the data steward. Mention missingness if given, but for PII/identifiers missingness is informational only and does NOT justify filling.
-- "value": object with ONLY the actions that were proposed for that column. For each action:
-   {"status": "accepted"|"rejected", "value": <string|null>}
-The output schema is:
-{
-  "<COLUMN>": {
-    "text": {<the recommendation as a comprehensible text>},
-    "value": {
-        "<action>": {"status":"accepted"|"rejected", "value":<str|null>},
-        ...
-    }
-  },
-  ...
-}
-Rules:
-- ALLOWED_ACTIONS = {fill, mask, generalize, drop, categorize, enrich, keep}
-- PII/identifiers: PERSON, EMAIL_ADDRESS, PHONE_NUMBER, CIN, ID_MAROC, IBAN_CODE, LOCATION, DATE_TIME
-- Prefer mask/generalize for PII/identifiers. Never suggest filling with names/emails/numbers or fabricated identities.
-- Exactly ONE action per column should be "accepted"; others must be "rejected".
-- "value" meaning:
-   • fill → "median"|"mean"|"mode"|approved placeholder string (only for non-PII)
-   • generalize → "year"|"month" etc.
-   • mask/drop/categorize/enrich → usually null
-- Do not invent actions that were not proposed for that column.
-- If information is insufficient, be conservative and state that in "text".
-- You will be provided next we a glossary of PII s and SII s be sure to include them as a reason for your decision.
-{
-  "VERSION": "2025-09-16",
-  "DEFINITIONS": {
-    "PII": "Personal data that can identify or relate to an individual but is not a GDPR Article 9 special category. Requires lawful basis, minimization, and security.",
-    "SII": "Sensitive/special-category personal data (GDPR Art. 9) requiring an additional Article 9(2) condition. In Morocco (Law 09-08), 'données sensibles' typically need CNDP prior authorization."
-  },
-  "ALIASES": {
-    "MIBAN_CODE": "IBAN_CODE"
-  },
-  "ENTITIES": {
-    "PERSON":              {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "EMAIL_ADDRESS":       {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "PHONE_NUMBER":        {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "LOCATION":            {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "medium", "default_action": "mask"},
-    "POSTAL_CODE":         {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "medium", "default_action": "generalize"},
-    "DATE_TIME":           {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "medium", "default_action": "generalize"},
-    "DATE_OF_BIRTH":       {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "generalize"},
-    "AGE":                 {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "low",    "default_action": "generalize"},
-    "JOB_TITLE":           {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "medium", "default_action": "mask"},
-    "NATIONALITY":         {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "medium", "default_action": "mask"},
-
-    "CIN":                 {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": true},  "risk": "critical","default_action": "mask"},
-    "ID_MAROC":            {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": true},  "risk": "critical","default_action": "mask"},
-    "PASSPORT":            {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "DRIVER_LICENSE":      {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "INSURANCE_NUMBER":    {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "INTERNAL_ID":         {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "medium", "default_action": "tokenize"},
-
-    "IBAN_CODE":           {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "BANK_ACCOUNT":        {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "high",   "default_action": "mask"},
-    "CREDIT_CARD":         {"category": "PII", "gdpr": {"special_category": false}, "ma_0908": {"sensitive": false, "authorization_required": false}, "risk": "critical","default_action": "mask"},
-
-    "HEALTH_DATA":         {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "critical","default_action": "mask"},
-    "MEDICAL_CONDITION":   {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "critical","default_action": "mask"},
-    "BLOOD_TYPE":          {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "high",   "default_action": "mask"},
-    "GENETIC_DATA":        {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "critical","default_action": "mask"},
-    "BIOMETRIC_DATA_ID":   {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "critical","default_action": "mask"},
-    "RACIAL_ETHNIC_ORIGIN":{"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "high",   "default_action": "mask"},
-    "POLITICAL_OPINION":   {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "high",   "default_action": "mask"},
-    "RELIGIOUS_BELIEF":    {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "high",   "default_action": "mask"},
-    "TRADE_UNION_MEMBERSHIP":{"category": "SII","gdpr": {"special_category": true}, "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "high",   "default_action": "mask"},
-    "SEXUAL_ORIENTATION":  {"category": "SII", "gdpr": {"special_category": true},  "ma_0908": {"sensitive": true,  "authorization_required": true},  "risk": "critical","default_action": "mask"}
-  }
-}
-INPUT
-""".strip()
 
+_llm_cache_lock = threading.Lock()
+
+
+def dump_payload(obj) -> str:
+    """Canonical compact JSON of a prompt payload: sorted keys, numpy values and NaN made JSON safe
+    (util.json_safe), with orjson when it is installed (same output as the json fallback)."""
+    safe = json_safe(obj)
+    if orjson is not None:
+        return orjson.dumps(safe, option=orjson.OPT_SORT_KEYS).decode("utf-8")
+    return json.dumps(safe, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def llm_cache_key(chunk: Dict[str, List[dict]]) -> str:
+    """Hash of everything that shapes the answer: provider, endpoint, model, sampling settings,
+    header and the chunk as canonical json (same defaults as llm_helper)."""
+    payload = [
+        (os.getenv("LLM_METHOD") or os.getenv("LLM_PROVIDER") or "ollama").lower(),
+        os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"), os.getenv("OLLAMA_HOST", "http://localhost:11434"),
+        os.getenv("OPENAI_MODEL"), os.getenv("OLLAMA_MODEL"),
+        os.getenv("OPENAI_TEMPERATURE", "0.2"), os.getenv("OPENAI_MAX_TOKENS", "512"),
+        _LLM_HEADER, chunk,
+    ]
+    return hashlib.blake2b(dump_payload(payload).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _llm_cache_db() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(LLM_CACHE_PATH) or ".", exist_ok=True)
+    db = sqlite3.connect(LLM_CACHE_PATH)
+    db.execute("CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, raw TEXT NOT NULL)")
+    return db
+
+
+def cached_answers(keys: List[str]) -> Dict[str, str]:
+    """Stored LLM answers of the given keys (missing keys are left out)."""
+    if not keys or not LLM_DISK_CACHE or os.getenv("LLM_CACHE", "1") != "1":
+        return {}
+    try:
+        with _llm_cache_lock:
+            db = _llm_cache_db()
+            try:
+                rows = db.execute(
+                    f"SELECT key, raw FROM answers WHERE key IN ({','.join('?' * len(keys))})", keys
+                ).fetchall()
+            finally:
+                db.close()
+    except sqlite3.Error:
+        return {}
+    return dict(rows)
+
+
+def store_answers(answers: Dict[str, str]) -> None:
+    """Keep the LLM answers for the next runs, a failing cache never fails the recommendation."""
+    if not answers or not LLM_DISK_CACHE or os.getenv("LLM_CACHE", "1") != "1":
+        return
+    try:
+        with _llm_cache_lock:
+            db = _llm_cache_db()
+            try:
+                with db:
+                    db.executemany("INSERT OR REPLACE INTO answers (key, raw) VALUES (?, ?)", answers.items())
+            finally:
+                db.close()
+    except sqlite3.Error:
+        pass
+
+
+def chunk_columns(grouped: Dict[str, List[dict]], size: int) -> List[Dict[str, List[dict]]]:
+    """Split the grouped recommendations in dicts of at most `size` columns (in order)."""
+    items = list(grouped.items())
+    return [dict(items[i:i + size]) for i in range(0, len(items), size)]
+
+
+def parse_plan(raw) -> dict:
+    """Extract the JSON object of an LLM answer (it may be wrapped in fences or prose).
+    The answer is parsed as a whole first (what the prompt asks for), otherwise the first
+    object is decoded from its opening brace and whatever follows it is ignored.
+    """
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="replace")
+    if not isinstance(raw, str):
+        return {}
+    try:
+        parsed = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    except ValueError:
+        i = raw.find("{")
+        if i == -1:
+            return {}
+        try:
+            parsed, _ = _json_decoder.raw_decode(raw, i)
+        except ValueError:
+            return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+_llm_logger: Optional[logging.Logger] = None
+_llm_logger_lock = threading.Lock()
+
+
+def llm_logger() -> logging.Logger:
+    """Logger of the prompts and answers, set up on first use. The records go through a queue to
+    a listener thread that appends them to LLM_LOG_PATH (rotated) as json lines, so a request
+    never waits on the disk and concurrent requests don't overwrite each other."""
+    global _llm_logger
+    if _llm_logger is None:
+        with _llm_logger_lock:
+            if _llm_logger is None:
+                os.makedirs(os.path.dirname(LLM_LOG_PATH) or ".", exist_ok=True)
+                records = queue.SimpleQueue()
+                handler = RotatingFileHandler(LLM_LOG_PATH, maxBytes=10_000_000, backupCount=3, encoding="utf-8", errors="replace")
+                # one json object per line, the message is already json (see dump_payload)
+                handler.setFormatter(logging.Formatter('{"time":"%(asctime)s","record":%(message)s}'))
+                listener = QueueListener(records, handler)
+                listener.start()
+                atexit.register(listener.stop) # flushes the queue on exit
+                logger = logging.getLogger(__name__ + ".llm")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(QueueHandler(records))
+                logger.info(dump_payload({"system": _LLM_HEADER}))
+                _llm_logger = logger
+    return _llm_logger
 
 
 def recommend_actions(df: pd.DataFrame) -> dict:
-    """Run analyzers → group candidates → call LLM once → return combined payload.
+    """Run analyzers → group candidates → call LLM (a few columns per call) → return combined payload.
 
     Returns
     -------
@@ -403,11 +546,16 @@ def recommend_actions(df: pd.DataFrame) -> dict:
     """
     grouped: Dict[str, List[dict]] = {}
 
-    # Run all analyzers
-    na_results = analyze_table_na(df)
-    pii_results = process_pii(df)
-    enrich_results = enrich_headers(df)
-    categorize_results = analyze_categorization(df)
+    # Run all analyzers, they only read df so they run side by side
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        na_future = executor.submit(analyze_table_na, df)
+        pii_future = executor.submit(process_pii, df)
+        enrich_future = executor.submit(enrich_headers, df)
+        categorize_future = executor.submit(analyze_categorization, df)
+        na_results = na_future.result()
+        pii_results = pii_future.result()
+        enrich_results = enrich_future.result()
+        categorize_results = categorize_future.result()
     all_results: Dict[str, List[dict]] = {}
     for results_dict in [na_results, pii_results, enrich_results, categorize_results]:
         for col, rec in results_dict.items():
@@ -416,33 +564,33 @@ def recommend_actions(df: pd.DataFrame) -> dict:
         filtered = [r for r in recs if r.get("action") != "keep"]
         if filtered:
             grouped[col] = filtered
-
-    prompt = _LLM_HEADER + "\n" + str(grouped)
-    raw = ask_llm(prompt)
-    cleaned = raw
-    if isinstance(raw, str):
-        cleaned = raw.strip()
-        i, j = cleaned.find("{"), cleaned.rfind("}")
-        if i != -1 and j != -1:
-            cleaned = cleaned[i:j+1]
-    else:
-        cleaned = ""
-
-    try:
-        parsed_plan = json.loads(cleaned) if cleaned else {}
-        if not isinstance(parsed_plan, dict):
-            parsed_plan = {}
-    except Exception:
-        parsed_plan = {}
-
-    try:
-        with open("logs/recommendations.log", "w", encoding="utf-8", errors="replace") as f:
-            f.write("=== PROMPT ===\n" + prompt + "\n\n")
-            f.write("===GROUPED===\n" + str(grouped) + "\n\n")
-            f.write("=== RAW ===\n" + (raw or "") + "\n\n")
-    except Exception:
-        pass
+    if not grouped: # only keep actions, nothing to ask the LLM
+        return serialize_recommendation(grouped, {})
+
+    # the columns go to the LLM a few at a time: the calls run concurrently and each one has a
+    # shorter prompt and answer, then the per-column answers are merged back into one plan
+    chunks = chunk_columns(grouped, LLM_COLUMNS_PER_CALL)
+    # the header is sent apart as the system prompt, so the server can reuse its cached prefix
+    prompts = [dump_payload(chunk) for chunk in chunks]
+    # answers of already seen chunks (same csv re-run, pagination) come from the cache
+    keys = [llm_cache_key(chunk) for chunk in chunks]
+    hits = cached_answers(keys)
+    todo = [i for i, key in enumerate(keys) if key not in hits]
+    fresh = ask_llm_batch([prompts[i] for i in todo], system=_LLM_HEADER)
+    store_answers({keys[i]: raw for i, raw in zip(todo, fresh) if parse_plan(raw)})
+    raws = [hits.get(key) for key in keys]
+    for i, raw in zip(todo, fresh):
+        raws[i] = raw
+    parsed_plan: Dict[str, Any] = {}
+    for chunk, raw in zip(chunks, raws):
+        plan = parse_plan(raw)
+        parsed_plan.update((col, value) for col, value in plan.items() if col in chunk)
+
+    # debugging aid, written off the request path
+    if LOG_LLM:
+        logger = llm_logger()
+        for prompt, raw in zip(prompts, raws):
+            logger.info(dump_payload({"prompt": prompt, "raw": raw or ""}))
+        for col, recs in grouped.items():
+            logger.info(dump_payload({"column": col, "recs": recs}))
     return serialize_recommendation(grouped, parsed_plan)
-
-
-
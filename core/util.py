@@ -4,7 +4,46 @@ import numpy as np
 import pandas as pd
 import json
 
+# orjson is optional (see requirements.txt): faster than json.dump for the serialized recommendations
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _float_safe(x):
+    # x - x is nan for nan and +-inf, 0 for every other float
+    return x if x - x == 0 else None
+
+def _np_float_safe(x):
+    return _float_safe(float(x))
+
+def _dict_safe(x):
+    return {str(k): json_safe(v) for k, v in x.items()}
+
+def _list_safe(x):
+    return [json_safe(v) for v in x]
+
+def _same(x):
+    return x
+
+# exact type -> converter, one dict lookup for the common leaves and containers
+# (subclasses and other types go through the isinstance chain of _json_safe_other)
+_SAFE_BY_TYPE = {
+    type(None): _same, str: _same, bool: _same, int: _same,
+    float: _float_safe, np.float64: _np_float_safe,
+    np.float32: _np_float_safe, np.float16: _np_float_safe,
+    np.int64: int, np.int32: int, np.int16: int, np.int8: int,
+    np.uint64: int, np.uint32: int, np.uint16: int, np.uint8: int,
+    dict: _dict_safe, list: _list_safe, tuple: _list_safe, set: _list_safe,
+}
+
 def json_safe(x):
+    handler = _SAFE_BY_TYPE.get(type(x))
+    if handler is not None:
+        return handler(x)
+    return _json_safe_other(x)
+
+def _json_safe_other(x):
     if x is None:
         return None
     if isinstance(x, (str, bool, int)):
@@ -69,5 +108,10 @@ if __name__ == "__main__":
             parsed_plan = {}
     except Exception:
         parsed_plan = {}
-    with open("logs/llm_serialized_recommendation.txt", "w", encoding="utf-8") as f:
-        json.dump(serialize_recommendation(grouped, parsed_plan), f, indent=2, ensure_ascii=False)
\ No newline at end of file
+    serialized = serialize_recommendation(grouped, parsed_plan)
+    if orjson is not None:
+        with open("logs/llm_serialized_recommendation.txt", "wb") as f:
+            f.write(orjson.dumps(serialized, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open("logs/llm_serialized_recommendation.txt", "w", encoding="utf-8") as f:
+            json.dump(serialized, f, indent=2, ensure_ascii=False)
\ No newline at end of file
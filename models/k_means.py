@@ -1,5 +1,7 @@
 import json
 import pickle
+import numpy as np
+import torch
 from sklearn.cluster import KMeans
 from sklearn.decomposition import PCA
 from sklearn.metrics import silhouette_score
@@ -14,8 +16,15 @@ headers = [entry["header"] for entry in data]
 labels = [entry["label"] for entry in data]
 
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
-embeddings = model.encode(headers)
+# the encoding runs on the gpu in fp16 when there is one, the embeddings are cast back to float32
+# so PCA/KMeans (and core/recommendation.py, which encodes on cpu) see the same dtype
+device = "cuda" if torch.cuda.is_available() else "cpu"
+model = SentenceTransformer("all-MiniLM-L6-v2", device=device)
+if device == "cuda":
+    model.half()
+embeddings = model.encode(headers, batch_size=256, convert_to_numpy=True, show_progress_bar=False).astype(np.float32)
+if device == "cuda":
+    model.float().to("cpu") # the saved encoder stays the fp32 cpu model
 
 
 pca = PCA(n_components=20, random_state=42)
@@ -30,8 +39,9 @@ kmeans.fit(reduced_embeddings)
 with open("models/kmeans_headers.pkl", "wb") as f:
     pickle.dump(kmeans, f)
 
-with open("models/header_encoder.pkl", "wb") as f:
-    pickle.dump(model, f)
+# saved as a model directory (safetensors weights, memory mapped when loaded)
+# core/recommendation.py prefers it to the older header_encoder.pkl
+model.save("models/header_encoder")
 
 with open("models/pca_transform.pkl", "wb") as f:
     pickle.dump(pca, f)
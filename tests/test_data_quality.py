@@ -0,0 +1,48 @@
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from core import data_quality
+from core.data_quality import count_invalid, dup, URL_RE, DATE_RE, EMAIL_RE
+
+
+class TestCountInvalid(unittest.TestCase):
+
+    CASES = (
+        (URL_RE, ["https://example.com/a", "https://café.fr/menu", "ftp://x.org", "http://exemple.ma/é"]),
+        (DATE_RE, ["2024-01-31", "١٢/٠٦/١٩٩٥", "31/01/2024", "not a date", "２０２４-０１-３１"]),
+        (EMAIL_RE, ["a@b.com", "josé@mail.com", "x@y.org"]),
+        (URL_RE, ["https://example.com", "http://a.b/c?d=e", "nope"]),  # ascii only
+    )
+
+    def test_pyarrow_and_re_paths_agree(self):
+        # the count must not depend on whether pyarrow is installed, non-ascii cells included
+        for pattern, values in self.CASES:
+            data = pd.Series(values, dtype=object)
+            with self.subTest(pattern=pattern.pattern, values=values):
+                with mock.patch.object(data_quality, "pc", None):
+                    fallback = count_invalid(data, pattern)
+                expected = sum(1 for v in values if not pattern.match(v))
+                self.assertEqual(fallback, expected)
+                self.assertEqual(count_invalid(data, pattern), expected)
+
+
+class TestDup(unittest.TestCase):
+
+    def test_mixed_missing_values(self):
+        # same counts as duplicated() and nunique() column by column, with None and NaN in one column
+        df = pd.DataFrame({
+            "text": pd.Series(["a", None, np.nan, "a", pd.NA, None], dtype=object),
+            "num": [1.0, np.nan, np.nan, 2.0, 2.0, 3.0],
+            "empty": pd.Series([None, np.nan, None, np.nan, None, np.nan], dtype=object),
+        })
+        columns = dup(df)["column_duplicates"]
+        for col in df.columns:
+            with self.subTest(col=col):
+                self.assertEqual(columns[col]["unique_values"], df[col].nunique())
+                self.assertEqual(columns[col]["duplicate_count"], df[col].duplicated().sum())
+        self.assertEqual(columns["text"]["unique_values"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+import pandas as pd
+from core.data_steward import generalize_dates, generalize_date_to_decade
+
+
+class TestGeneralizeDates(unittest.TestCase):
+
+    VALUES = [
+        "1983-11-12", "2003", "2025/04/04", "12/06/1995", "12-06-1995", "1983-11", "1983/11",
+        " 2011-01-01 ", "31/02/2020", "13/13/2020", "0999", "2020-13-45",
+        "not a date", "", "12/06/95", "1995-06-12T10:00", "abcd", 1995, 1995.0,
+        None, np.nan, pd.NA,
+    ]
+
+    def per_cell(self, series):
+        return pd.Series([generalize_date_to_decade(v) for v in series], index=series.index, dtype=object)
+
+    def test_matches_per_cell_version(self):
+        # the column version must give what generalize_date_to_decade gives cell by cell
+        series = pd.Series(self.VALUES, index=range(10, 10 + len(self.VALUES)), dtype=object)
+        pd.testing.assert_series_equal(generalize_dates(series), self.per_cell(series))
+
+    def test_decades(self):
+        out = generalize_dates(pd.Series(["1983-11-12", "2003", "2025/04/04", "0999", "31/02/2020"]))
+        self.assertEqual(out.tolist(), ["1980s", "2000s", "2020s", "990s", "2020s"])
+
+    def test_unparsed_and_missing_values_are_kept(self):
+        series = pd.Series(["not a date", None, np.nan, "12/06/95"], dtype=object)
+        out = generalize_dates(series)
+        self.assertEqual(out.iloc[0], "not a date")
+        self.assertIsNone(out.iloc[1])
+        self.assertTrue(np.isnan(out.iloc[2]))
+        self.assertEqual(out.iloc[3], "12/06/95")
+
+    def test_all_missing_and_empty(self):
+        pd.testing.assert_series_equal(generalize_dates(pd.Series([None, np.nan], dtype=object)),
+                                       pd.Series([None, np.nan], dtype=object))
+        self.assertEqual(len(generalize_dates(pd.Series([], dtype=object))), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
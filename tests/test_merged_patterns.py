@@ -0,0 +1,61 @@
+import unittest
+import pandas as pd
+from presidio_analyzer import PatternRecognizer
+from core.logic import MergedPatternRecognizer, MERGED_PATTERNS, re2
+
+TEXTS = [
+    "My CIN is AB123456",
+    "His passport number is X1234567",
+    "Carte de séjour: 1234567890",
+    "Blood type: AB+",
+    "blood group o negative, Rh null, B pos and A-",
+    "TIN: 123456789012345",
+    "Internal ID: EMP-002345",
+    "ab123456 x1234567 EMP-1234EMP-99999",
+    "AB123456X1234567 1234567890123456 123456789",
+    "n°1234567890.\nEMP-002345\r\nAB-",
+    "é1234567 Ω12345 ÀB123456",
+    "",
+]
+
+
+def expected_results(text):
+    found = set()
+    for entity, pattern in MERGED_PATTERNS:
+        recognizer = PatternRecognizer(supported_entity=entity, patterns=[pattern])
+        found.update((r.entity_type, r.start, r.end, r.score) for r in recognizer.analyze(text, [entity]))
+    return found
+
+
+class TestMergedPatternRecognizer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        texts = TEXTS + pd.read_csv("assets/test.csv", dtype=str)["text"].dropna().head(200).tolist()
+        cls.cases = [(text, expected_results(text)) for text in texts]
+
+    def check(self, recognizer):
+        for text, expected in self.cases:
+            with self.subTest(text=text[:60]):
+                found = {(r.entity_type, r.start, r.end, r.score) for r in recognizer.analyze(text, [])}
+                self.assertEqual(found, expected)
+
+    def test_same_as_one_recognizer_per_pattern(self):
+        recognizer = MergedPatternRecognizer(MERGED_PATTERNS)
+        recognizer.master_re2 = None  # the regex path
+        self.check(recognizer)
+
+    @unittest.skipIf(re2 is None, "google-re2 is not installed")
+    def test_same_with_re2(self):
+        recognizer = MergedPatternRecognizer(MERGED_PATTERNS)
+        self.assertIsNotNone(recognizer.master_re2)
+        self.check(recognizer)
+
+    def test_entities_filter(self):
+        recognizer = MergedPatternRecognizer(MERGED_PATTERNS)
+        found = recognizer.analyze("AB123456 X1234567", ["PASSPORT"])
+        self.assertEqual({r.entity_type for r in found}, {"PASSPORT"})
+
+
+if __name__ == "__main__":
+    unittest.main()
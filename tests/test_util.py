@@ -0,0 +1,32 @@
+import json
+import unittest
+import numpy as np
+from core.util import json_safe, orjson
+
+
+class TestJsonSafe(unittest.TestCase):
+
+    VALUE = {
+        "mean": np.float64(2.5), "f32": np.float32(0.5), "nan": np.float64("nan"),
+        "inf": np.float32("inf"), "count": np.int64(3), 4: [np.float64(1.0), (np.uint8(2), None)],
+    }
+    EXPECTED = {"mean": 2.5, "f32": 0.5, "nan": None, "inf": None, "count": 3, "4": [1.0, [2, None]]}
+
+    def test_numpy_scalars_become_python_types(self):
+        safe = json_safe(self.VALUE)
+        self.assertEqual(safe, self.EXPECTED)
+        self.assertIs(type(safe["mean"]), float)
+        self.assertIs(type(safe["count"]), int)
+
+    def test_serializable_without_numpy_support(self):
+        self.assertEqual(json.loads(json.dumps(json_safe(self.VALUE))), self.EXPECTED)
+
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_orjson_serializable(self):
+        # orjson refuses numpy scalars unless OPT_SERIALIZE_NUMPY is passed
+        dumped = orjson.dumps(json_safe(self.VALUE), option=orjson.OPT_SORT_KEYS)
+        self.assertEqual(orjson.loads(dumped), self.EXPECTED)
+
+
+if __name__ == "__main__":
+    unittest.main()